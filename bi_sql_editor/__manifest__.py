@@ -5,7 +5,7 @@
 {
     'name': 'BI SQL Editor',
     'summary': 'BI Views builder, based on Materialized or Normal SQL Views',
-    'version': '11.0.1.0.0',
+    'version': '11.0.1.4.0',
     'license': 'AGPL-3',
     'category': 'Reporting',
     'author': 'GRAP,Odoo Community Association (OCA)',
@@ -16,6 +16,7 @@
     ],
     'data': [
         'security/ir.model.access.csv',
+        'data/ir_cron.xml',
         'views/view_bi_sql_view.xml',
         'views/action.xml',
         'views/menu.xml',
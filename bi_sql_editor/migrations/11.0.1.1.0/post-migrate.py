@@ -0,0 +1,20 @@
+# Copyright (C) 2017 - Today: GRAP (http://www.grap.coop)
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl.html).
+
+
+def migrate(cr, version):
+    # the names of the actions of the materialized views do not hold the
+    # date of their last refresh anymore: restore the names of the views
+    cr.execute("""
+        UPDATE ir_act_window AS action
+           SET name = view.name
+          FROM bi_sql_view AS view
+         WHERE view.action_id = action.id
+           AND action.name != view.name
+     RETURNING action.id""")
+    action_ids = [row[0] for row in cr.fetchall()]
+    if action_ids:
+        cr.execute("""
+            DELETE FROM ir_translation
+             WHERE name = 'ir.actions.act_window,name'
+               AND res_id IN %s""", (tuple(action_ids),))
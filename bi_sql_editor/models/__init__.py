@@ -1,4 +1,5 @@
 # License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl.html).
 
+from . import models
 from . import bi_sql_view
 from . import bi_sql_view_field
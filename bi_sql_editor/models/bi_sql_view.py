@@ -3,11 +3,14 @@
 # License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl.html).
 
 import logging
-from datetime import datetime
-from psycopg2 import ProgrammingError
+import re
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from psycopg2 import Error, OperationalError, ProgrammingError, errorcodes
 
 from odoo import _, api, fields, models, SUPERUSER_ID
-from odoo.exceptions import UserError
+from odoo.exceptions import UserError, ValidationError
 from odoo.tools import pycompat, sql
 from odoo.addons.base.ir.ir_model import IrModel
 
@@ -57,6 +60,28 @@ class BiSQLView(models.Model):
         ('ui_valid', 'Views, Action and Menu Created'),
     ]
 
+    _REFRESH_POLICY_SELECTION = [
+        ('cron', 'Scheduled Refresh Only'),
+        ('on_read', 'Refresh on Read if Stale'),
+    ]
+
+    _REFRESH_STATE_SELECTION = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+
+    # Duration in seconds after which a refresh still marked as running is
+    # considered as interrupted (worker killed, crash of the cron task)
+    _REFRESH_RUNNING_TIMEOUT = 3600
+
+    _REFRESH_FAILURE_SELECTION = [
+        ('statement_timeout', 'Statement Timeout'),
+        ('lock_timeout', 'Lock Timeout'),
+        ('error', 'SQL Error'),
+    ]
+
     technical_name = fields.Char(
         string='Technical Name', required=True,
         help="Suffix of the SQL view. SQL full name will be computed and"
@@ -87,6 +112,76 @@ class BiSQLView(models.Model):
         string='Database Size', readonly=True,
         help="Size of the materialized view and its indexes")
 
+    last_refresh = fields.Datetime(
+        string='Last Refresh', readonly=True, copy=False,
+        help="Date and time of the last refresh of the materialized view")
+
+    refresh_policy = fields.Selection(
+        string='Refresh Policy', selection=_REFRESH_POLICY_SELECTION,
+        default='cron', required=True,
+        help="Scheduled Refresh Only: the materialized view is only"
+        " refreshed by its cron task or manually.\n"
+        "Refresh on Read if Stale: the materialized view is also refreshed"
+        " when a user reads it and its data is older than the Maximum Age.")
+
+    max_age = fields.Integer(
+        string='Maximum Age (Minutes)', default=0,
+        help="Age after which the data of the materialized view is"
+        " considered as stale. Set 0 to never consider it stale.")
+
+    refresh_state = fields.Selection(
+        string='Refresh State', readonly=True, copy=False,
+        selection=_REFRESH_STATE_SELECTION,
+        help="State of the last refresh requested by a user, processed in"
+        " background")
+
+    refresh_user_id = fields.Many2one(
+        string='Refresh Requested By', comodel_name='res.users',
+        readonly=True, copy=False)
+
+    refresh_queue_date = fields.Datetime(
+        string='Refresh Queued On', readonly=True, copy=False)
+
+    refresh_start_date = fields.Datetime(
+        string='Refresh Started On', readonly=True, copy=False)
+
+    refresh_end_date = fields.Datetime(
+        string='Refresh Ended On', readonly=True, copy=False)
+
+    refresh_elapsed = fields.Integer(
+        string='Refresh Elapsed Time (Seconds)',
+        compute='_compute_refresh_elapsed')
+
+    refresh_failure = fields.Selection(
+        string='Last Refresh Failure', readonly=True, copy=False,
+        selection=_REFRESH_FAILURE_SELECTION,
+        help="Cause of the failure of the last refresh, if it failed")
+
+    refresh_failure_message = fields.Text(
+        string='Last Refresh Failure Message', readonly=True, copy=False)
+
+    statement_timeout = fields.Integer(
+        string='Statement Timeout (Seconds)', default=0,
+        help="Abort the creation or the refresh of the view if it takes"
+        " more than this duration. Set 0 to use the database setting.")
+
+    lock_timeout = fields.Integer(
+        string='Lock Timeout (Seconds)', default=0,
+        help="Abort the creation or the refresh of the view if it waits"
+        " more than this duration for a lock. Set 0 to use the database"
+        " setting.")
+
+    work_mem = fields.Char(
+        string='Work Memory',
+        help="Memory used by sort and hash operations during the creation"
+        " or the refresh of the view, before spilling to disk."
+        " For exemple '256MB'. Keep empty to use the database setting.")
+
+    max_parallel_workers_per_gather = fields.Integer(
+        string='Max Parallel Workers', default=-1,
+        help="Maximum number of parallel workers used by the creation or"
+        " the refresh of the view. Set -1 to use the database setting.")
+
     state = fields.Selection(selection_add=_STATE_SQL_EDITOR)
 
     view_order = fields.Char(string='View Order',
@@ -182,6 +277,15 @@ class BiSQLView(models.Model):
                         raise UserError(_(
                             'Only graph, pivot or tree views are supported'))
 
+    @api.constrains('work_mem')
+    @api.multi
+    def _check_work_mem(self):
+        for rec in self.filtered(lambda x: x.work_mem):
+            if not re.match(r'^\d+\s*(kB|MB|GB|TB)?$', rec.work_mem.strip()):
+                raise ValidationError(_(
+                    "Work Memory should be a number of kilobytes, optionally"
+                    " followed by a unit (kB, MB, GB or TB)."))
+
     # Compute Section
     @api.depends('is_materialized')
     @api.multi
@@ -190,6 +294,15 @@ class BiSQLView(models.Model):
             sql_view.materialized_text =\
                 sql_view.is_materialized and 'MATERIALIZED' or ''
 
+    @api.multi
+    def _compute_refresh_elapsed(self):
+        now = datetime.now()
+        for sql_view in self.filtered(lambda x: x.refresh_start_date):
+            end_date = sql_view.refresh_end_date and\
+                fields.Datetime.from_string(sql_view.refresh_end_date) or now
+            sql_view.refresh_elapsed = (end_date - fields.Datetime.from_string(
+                sql_view.refresh_start_date)).total_seconds()
+
     @api.depends('technical_name')
     @api.multi
     def _compute_view_name(self):
@@ -302,7 +415,7 @@ class BiSQLView(models.Model):
 
     @api.multi
     def button_refresh_materialized_view(self):
-        self._refresh_materialized_view()
+        self._queue_refresh(user=self.env.user)
 
     @api.multi
     def button_open_view(self):
@@ -445,7 +558,7 @@ class BiSQLView(models.Model):
         else:
             view_id = self.graph_view_id.id
         return {
-            'name': self._prepare_action_name(),
+            'name': self.name,
             'res_model': self.model_id.model,
             'type': 'ir.actions.act_window',
             'view_mode': view_mode,
@@ -453,15 +566,6 @@ class BiSQLView(models.Model):
             'search_view_id': self.search_view_id.id,
         }
 
-    @api.multi
-    def _prepare_action_name(self):
-        self.ensure_one()
-        if not self.is_materialized:
-            return self.name
-        return "%s (%s)" % (
-            self.name,
-            datetime.utcnow().strftime(_("%m/%d/%Y %H:%M:%S UTC")))
-
     @api.multi
     def _prepare_menu(self):
         self.ensure_one()
@@ -477,26 +581,64 @@ class BiSQLView(models.Model):
         _logger.info("Executing SQL Request %s ..." % req)
         self.env.cr.execute(req)
 
+    @api.multi
+    def _prepare_execution_settings(self):
+        """Return the PostgreSQL settings to apply while creating or
+        refreshing the view, as a dict {setting: value}."""
+        self.ensure_one()
+        res = {}
+        if self.statement_timeout:
+            res['statement_timeout'] = '%ds' % self.statement_timeout
+        if self.lock_timeout:
+            res['lock_timeout'] = '%ds' % self.lock_timeout
+        if self.work_mem:
+            res['work_mem'] = self.work_mem.strip()
+        if self.max_parallel_workers_per_gather >= 0:
+            res['max_parallel_workers_per_gather'] =\
+                str(self.max_parallel_workers_per_gather)
+        return res
+
+    @contextmanager
+    def _execution_settings(self):
+        """Apply the execution settings of the view for the statements
+        executed in the block, as a SET LOCAL would do, and restore the
+        previous values after it. If the block fails, the transaction (or
+        the enclosing savepoint) has to be rolled back, which also restores
+        the previous values."""
+        cr = self.env.cr
+        previous = {}
+        for name, value in self._prepare_execution_settings().items():
+            cr.execute("SELECT current_setting(%s)", (name,))
+            previous[name] = cr.fetchone()[0]
+            cr.execute("SELECT set_config(%s, %s, true)", (name, value))
+        yield
+        for name, value in previous.items():
+            cr.execute("SELECT set_config(%s, %s, true)", (name, value))
+
     @api.multi
     def _drop_view(self):
         for sql_view in self:
             self._log_execute(
                 "DROP %s VIEW IF EXISTS %s" % (
                     sql_view.materialized_text, sql_view.view_name))
-            sql_view.size = False
+            sql_view.write({'size': False, 'last_refresh': False})
 
     @api.multi
     def _create_view(self):
         for sql_view in self:
             sql_view._drop_view()
             try:
-                self._log_execute(sql_view._prepare_request_for_execution())
+                with sql_view._execution_settings():
+                    self._log_execute(
+                        sql_view._prepare_request_for_execution())
                 sql_view._refresh_size()
-            except ProgrammingError as e:
+                if sql_view.is_materialized:
+                    sql_view.last_refresh = fields.Datetime.now()
+            except (OperationalError, ProgrammingError) as e:
                 raise UserError(_(
                     "SQL Error while creating %s VIEW %s :\n %s") % (
                         sql_view.materialized_text, sql_view.view_name,
-                        e.message))
+                        e))
 
     @api.multi
     def _create_index(self):
@@ -544,16 +686,25 @@ class BiSQLView(models.Model):
     @api.multi
     def _hook_executed_request(self):
         self.ensure_one()
-        req = """
-            SELECT  attnum,
-                    attname AS column,
-                    format_type(atttypid, atttypmod) AS type
-            FROM    pg_attribute
-            WHERE   attrelid = '%s'::regclass
-            AND     NOT attisdropped
-            AND     attnum > 0
-            ORDER   BY attnum;""" % self.view_name
-        self._log_execute(req)
+        return self._get_columns_info()
+
+    @api.multi
+    def _get_columns_info(self):
+        """Return the list [(attnum, column, type), ...] of the columns of
+        the SQL view. The type is formatted with its modifier computed from
+        the typmod of the column (ie 'numeric(16,2)')."""
+        self.ensure_one()
+        self.env.cr.execute("""
+            SELECT  a.attnum,
+                    a.attname AS column,
+                    format_type(a.atttypid, a.atttypmod) AS type
+            FROM    pg_attribute a
+            JOIN    pg_class c ON c.oid = a.attrelid
+            WHERE   c.relname = %s
+            AND     pg_table_is_visible(c.oid)
+            AND     NOT a.attisdropped
+            AND     a.attnum > 0
+            ORDER   BY a.attnum;""", (self.view_name,))
         return self.env.cr.fetchall()
 
     @api.multi
@@ -634,12 +785,224 @@ class BiSQLView(models.Model):
         for sql_view in self.filtered(lambda x: x.is_materialized):
             req = "REFRESH %s VIEW %s" % (
                 sql_view.materialized_text, sql_view.view_name)
-            self._log_execute(req)
+            try:
+                with self.env.cr.savepoint():
+                    with sql_view._execution_settings():
+                        self._log_execute(req)
+            except Error as e:
+                _logger.warning(
+                    "Refresh of the view %s failed: %s",
+                    sql_view.view_name, e)
+                sql_view.write({
+                    'refresh_failure': sql_view._get_refresh_failure(e),
+                    'refresh_failure_message': str(e),
+                })
+                continue
             sql_view._refresh_size()
-            if sql_view.action_id:
-                # Alter name of the action, to display last refresh
-                # datetime of the materialized view
-                sql_view.action_id.name = sql_view._prepare_action_name()
+            sql_view.write({
+                'last_refresh': fields.Datetime.now(),
+                'refresh_failure': False,
+                'refresh_failure_message': False,
+            })
+
+    @api.model
+    def _get_refresh_failure(self, error):
+        if error.pgcode == errorcodes.QUERY_CANCELED:
+            return 'statement_timeout'
+        elif error.pgcode == errorcodes.LOCK_NOT_AVAILABLE:
+            return 'lock_timeout'
+        return 'error'
+
+    @api.multi
+    def _is_stale(self):
+        self.ensure_one()
+        if not self.max_age:
+            return False
+        if not self.last_refresh:
+            return True
+        limit = fields.Datetime.from_string(fields.Datetime.now()) -\
+            timedelta(minutes=self.max_age)
+        return fields.Datetime.from_string(self.last_refresh) < limit
+
+    @api.model
+    def _refresh_stale_materialized_view(self, model_name):
+        """Queue the refresh of the materialized view behind the model
+        ``model_name`` if its policy is to be refreshed on read and if it is
+        stale. If another transaction is already queuing it, nothing is
+        done."""
+        sql_view = self.sudo().search([
+            ('model_name', '=', model_name),
+            ('is_materialized', '=', True),
+            ('refresh_policy', '=', 'on_read'),
+            ('state', 'in', ['model_valid', 'ui_valid']),
+            ('refresh_state', '!=', 'queued'),
+        ], limit=1)
+        if not sql_view or not sql_view._is_stale():
+            return False
+        if sql_view.refresh_state == 'running' and \
+                not sql_view._is_refresh_stuck():
+            return False
+        if not sql_view._try_lock():
+            return False
+        sql_view._queue_refresh()
+        return True
+
+    @api.multi
+    def _try_lock(self):
+        """Lock the row of the view until the end of the transaction and
+        return True, or return False without waiting if another transaction
+        holds the lock. (SKIP LOCKED is not available before PostgreSQL
+        9.5)"""
+        self.ensure_one()
+        try:
+            with self.env.cr.savepoint():
+                self.env.cr.execute(
+                    "SELECT id FROM bi_sql_view WHERE id = %s"
+                    " FOR UPDATE NOWAIT", (self.id,), log_exceptions=False)
+        except OperationalError:
+            return False
+        return True
+
+    @api.multi
+    def _queue_refresh(self, user=False):
+        """Queue the refresh of the materialized views, that will be done
+        in background by the cron task 'Process Queued Refreshes'. If
+        ``user`` is set, this user is notified when the refresh is done."""
+        sql_views = self.filtered(lambda x: x.is_materialized)
+        if not sql_views:
+            return
+        sql_views.sudo().write({
+            'refresh_state': 'queued',
+            'refresh_user_id': user and user.id,
+            'refresh_queue_date': fields.Datetime.now(),
+            'refresh_start_date': False,
+            'refresh_end_date': False,
+        })
+        self._trigger_refresh_queue()
+
+    @api.multi
+    def _is_refresh_stuck(self):
+        """Return True if the view is marked as running for longer than
+        its refresh can last: the worker refreshing it was killed, or the
+        cron task crashed, so it must be queued again."""
+        self.ensure_one()
+        if self.refresh_state != 'running' or not self.refresh_start_date:
+            return False
+        timeout = max(
+            self._REFRESH_RUNNING_TIMEOUT, 2 * self.statement_timeout)
+        limit = fields.Datetime.from_string(fields.Datetime.now()) -\
+            timedelta(seconds=timeout)
+        return fields.Datetime.from_string(self.refresh_start_date) < limit
+
+    @api.model
+    def _requeue_stuck_refreshes(self):
+        sql_views = self.search([('refresh_state', '=', 'running')]).filtered(
+            lambda x: x._is_refresh_stuck())
+        for sql_view in sql_views:
+            _logger.warning(
+                "Refresh of the view %s did not end, it is queued again.",
+                sql_view.view_name)
+        sql_views.write({
+            'refresh_state': 'queued',
+            'refresh_start_date': False,
+        })
+        return sql_views
+
+    @api.model
+    def _trigger_refresh_queue(self):
+        """Set the next call of the queue cron task to now, once the
+        current transaction is committed. This is done in a separate
+        transaction, so that the row of the cron task is not locked until
+        the end of the request of the user."""
+        db_registry = self.pool
+
+        def trigger():
+            with api.Environment.manage(), db_registry.cursor() as cr:
+                env = api.Environment(cr, SUPERUSER_ID, {})
+                env[self._name]._set_refresh_queue_nextcall()
+
+        self.env.cr.after('commit', trigger)
+
+    @api.model
+    def _set_refresh_queue_nextcall(self):
+        """Set the next call of the queue cron task to now, unless it is
+        currently running: in that case, it will process the new items."""
+        cron = self.env.ref(
+            'bi_sql_editor.cron_refresh_queue', raise_if_not_found=False)
+        if not cron:
+            return
+        try:
+            with self.env.cr.savepoint():
+                self.env.cr.execute(
+                    "SELECT id FROM ir_cron WHERE id = %s FOR UPDATE NOWAIT",
+                    (cron.id,), log_exceptions=False)
+                cron.sudo().write({'nextcall': fields.Datetime.now()})
+        except OperationalError:
+            _logger.debug("Queue of refreshes is currently processed.")
+
+    @api.model
+    def _process_refresh_queue(self):
+        """Refresh the queued materialized views, one by one, each in its
+        own transaction, so that users can follow the progress."""
+        auto_commit = not getattr(threading.currentThread(), 'testing', False)
+        self._requeue_stuck_refreshes()
+        while True:
+            self.env.cr.execute("""
+                SELECT id FROM bi_sql_view
+                WHERE refresh_state = 'queued'
+                ORDER BY refresh_queue_date, id""")
+            # skip the views being taken by another worker
+            sql_view = next((
+                x for x in self.browse([row[0] for row in
+                                        self.env.cr.fetchall()])
+                if x._try_lock()), None)
+            if not sql_view:
+                break
+            # the state may have been changed by the worker that held the
+            # lock, before it was released
+            sql_view.invalidate_cache()
+            if sql_view.refresh_state != 'queued':
+                continue
+            sql_view.write({
+                'refresh_state': 'running',
+                'refresh_start_date': fields.Datetime.now(),
+            })
+            if auto_commit:
+                self.env.cr.commit()
+            sql_view._refresh_materialized_view()
+            sql_view.write({
+                'refresh_state':
+                    sql_view.refresh_failure and 'failed' or 'done',
+                'refresh_end_date': fields.Datetime.now(),
+            })
+            sql_view._notify_refresh_done()
+            if auto_commit:
+                self.env.cr.commit()
+
+    @api.multi
+    def _notify_refresh_done(self):
+        """Notify the users who requested the refresh in their inbox, if
+        the module 'mail' is installed."""
+        if 'mail.message' not in self.env:
+            return
+        for sql_view in self.filtered(lambda x: x.refresh_user_id):
+            if sql_view.refresh_state == 'done':
+                body = _(
+                    "The materialized view '%s' has been refreshed in %d"
+                    " seconds.") % (sql_view.name, sql_view.refresh_elapsed)
+            else:
+                body = _(
+                    "The refresh of the materialized view '%s' failed:"
+                    " %s") % (sql_view.name, sql_view.refresh_failure_message)
+            self.env['mail.message'].sudo().create({
+                'model': self._name,
+                'res_id': sql_view.id,
+                'message_type': 'notification',
+                'body': body,
+                'partner_ids': [(4, sql_view.refresh_user_id.partner_id.id)],
+                'needaction_partner_ids': [
+                    (4, sql_view.refresh_user_id.partner_id.id)],
+            })
 
     @api.multi
     def _refresh_size(self):
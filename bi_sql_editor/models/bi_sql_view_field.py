@@ -21,6 +21,7 @@ class BiSQLViewField(models.Model):
         ('integer', 'integer'),
         ('many2one', 'many2one'),
         ('selection', 'selection'),
+        ('text', 'text'),
     ]
 
     _GRAPH_TYPE_SELECTION = [
@@ -35,17 +36,22 @@ class BiSQLViewField(models.Model):
         ('available', 'Available'),
     ]
 
-    # Mapping to guess Odoo field type, from SQL column type
+    # Mapping to guess Odoo field type, from SQL column type, without
+    # its modifier. (ie 'numeric' for 'numeric(16,2)')
     _SQL_MAPPING = {
         'boolean': 'boolean',
+        'smallint': 'integer',
         'bigint': 'integer',
         'integer': 'integer',
+        'real': 'float',
         'double precision': 'float',
         'numeric': 'float',
-        'text': 'char',
+        'text': 'text',
         'character varying': 'char',
-        'date': 'datetime',
+        'character': 'char',
+        'date': 'date',
         'timestamp without time zone': 'datetime',
+        'timestamp with time zone': 'datetime',
     }
 
     name = fields.Char(string='Name', required=True, readonly=True)
@@ -100,6 +106,11 @@ class BiSQLViewField(models.Model):
         help="For 'Many2one' Odoo field.\n"
         " Comodel of the field.")
 
+    float_digits = fields.Char(
+        string='Digits', compute='_compute_float_digits',
+        help="For 'Float' Odoo field.\n"
+        " Precision and scale of the SQL column, if defined.")
+
     # Constrains Section
     @api.constrains('is_index')
     @api.multi
@@ -116,6 +127,15 @@ class BiSQLViewField(models.Model):
             sql_field.index_name = '%s_%s' % (
                 sql_field.bi_sql_view_id.view_name, sql_field.name)
 
+    @api.depends('sql_type')
+    @api.multi
+    def _compute_float_digits(self):
+        for sql_field in self:
+            type_name, modifiers = sql_field._split_sql_type(
+                sql_field.sql_type)
+            if type_name == 'numeric' and len(modifiers) == 2:
+                sql_field.float_digits = '[%d, %d]' % tuple(modifiers)
+
     # Overload Section
     @api.multi
     def create(self, vals):
@@ -125,13 +145,10 @@ class BiSQLViewField(models.Model):
             r'\w+', lambda m: m.group(0).capitalize(),
             field_without_prefix.replace('_id', '').replace('_', ' '))
 
-        # Guess ttype
-        # Don't execute as simple .get() in the dict to manage
-        # correctly the type 'character varying(x)'
-        ttype = False
-        for k, v in self._SQL_MAPPING.items():
-            if k in vals['sql_type']:
-                ttype = v
+        # Guess ttype, from the name of the SQL type, without its modifier
+        # (ie 'character varying' for 'character varying(64)')
+        type_name, modifiers = self._split_sql_type(vals['sql_type'])
+        ttype = self._SQL_MAPPING.get(type_name, False)
 
         # Guess many2one_model_id
         many2one_model_id = False
@@ -150,6 +167,23 @@ class BiSQLViewField(models.Model):
         return super(BiSQLViewField, self).create(vals)
 
     # Custom Section
+    @api.model
+    def _split_sql_type(self, sql_type):
+        """Return the name and the list of modifiers of a SQL type, as
+        formatted by PostgreSQL format_type(). Sample :
+        'numeric(16,2)' -> ('numeric', [16, 2])
+        'timestamp(3) with time zone' -> ('timestamp with time zone', [3])
+        'date' -> ('date', [])
+        The modifiers are computed by PostgreSQL from the column typmod.
+        """
+        sql_type = sql_type or ''
+        match = re.search(r'\(([\d, ]+)\)', sql_type)
+        if not match:
+            return sql_type, []
+        type_name = ' '.join(
+            (sql_type[:match.start()] + sql_type[match.end():]).split())
+        return type_name, [int(x) for x in match.group(1).split(',')]
+
     @api.model
     def _model_mapping(self):
         """Return dict of key value, to try to guess the model based on a
@@ -190,9 +224,11 @@ class BiSQLViewField(models.Model):
         self.ensure_one()
         res = ''
         if self.field_description and self.tree_visibility != 'unavailable':
-            res = """<field name="{}" {}/>""".format(
+            res = """<field name="{}" {}{}/>""".format(
                 self.name,
-                self.tree_visibility == 'hidden' and 'invisible="1"' or '')
+                self.tree_visibility == 'hidden' and 'invisible="1" ' or '',
+                self.ttype == 'float' and self.float_digits and
+                'digits="{}" '.format(self.float_digits) or '')
         return res
 
     @api.multi
@@ -0,0 +1,32 @@
+# Copyright (C) 2017 - Today: GRAP (http://www.grap.coop)
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl.html).
+
+from odoo import api, models
+
+
+def _bi_sql_view(_name):
+    return _name.startswith('x_bi_sql_view.')
+
+
+class Base(models.AbstractModel):
+    _inherit = 'base'
+
+    @api.model
+    def search_read(self, domain=None, fields=None, offset=0, limit=None,
+                    order=None):
+        if _bi_sql_view(self._name):
+            self.env['bi.sql.view']._refresh_stale_materialized_view(
+                self._name)
+        return super(Base, self).search_read(
+            domain=domain, fields=fields, offset=offset, limit=limit,
+            order=order)
+
+    @api.model
+    def read_group(self, domain, fields, groupby, offset=0, limit=None,
+                   orderby=False, lazy=True):
+        if _bi_sql_view(self._name):
+            self.env['bi.sql.view']._refresh_stale_materialized_view(
+                self._name)
+        return super(Base, self).read_group(
+            domain, fields, groupby, offset=offset, limit=limit,
+            orderby=orderby, lazy=lazy)
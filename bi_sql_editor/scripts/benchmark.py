@@ -0,0 +1,140 @@
+# Copyright (C) 2017 - Today: GRAP (http://www.grap.coop)
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl.html).
+"""Benchmark of the lifecycle of a BI SQL View.
+
+Generate synthetic source tables of the requested sizes, then time the
+validation, the creation, the refresh and a read_group of a materialized
+bi.sql.view built on each of them. One JSON object is printed per measured
+step, so that results of several versions can be compared.
+
+Everything is done in a single transaction, rolled back at the end, unless
+--commit is set: the generated tables and views are then kept. Sample:
+
+    python bi_sql_editor/scripts/benchmark.py -c odoo.cfg -d bench \\
+        --rows 1000000 --rows 10000000 > results.jsonl
+"""
+
+import argparse
+import json
+import sys
+import time
+
+import odoo
+from odoo import SUPERUSER_ID, api
+
+SOURCE_TABLE = 'bi_sql_editor_benchmark_%d'
+
+SOURCE_QUERY = """
+    SELECT
+        source.category AS x_category,
+        source.partner_id AS x_partner_id,
+        source.sale_date AS x_sale_date,
+        source.quantity AS x_quantity,
+        source.amount AS x_amount
+    FROM %s AS source"""
+
+
+def _create_source_table(cr, rows, categories):
+    table = SOURCE_TABLE % rows
+    cr.execute("DROP TABLE IF EXISTS %s" % table)
+    req = """
+        CREATE TABLE {table} AS
+        SELECT
+            serie AS id,
+            'Category ' || (serie %% %s) AS category,
+            (SELECT min(id) FROM res_partner) AS partner_id,
+            DATE '2010-01-01' + (serie %% 3650) AS sale_date,
+            (serie %% 100)::integer AS quantity,
+            round((random() * 1000)::numeric, 2)::numeric(16,2) AS amount
+        FROM generate_series(1, %s) AS serie""".format(table=table)
+    cr.execute(req, (categories, rows))
+    cr.execute("ANALYZE %s" % table)
+    return table
+
+
+def _measure(env, step, rows, func):
+    cr = env.cr
+    query_count = cr.sql_log_count
+    start = time.time()
+    func()
+    result = {
+        'module': 'bi_sql_editor',
+        'version': env.ref('base.module_bi_sql_editor').latest_version,
+        'step': step,
+        'rows': rows,
+        'duration': round(time.time() - start, 6),
+        'queries': cr.sql_log_count - query_count,
+    }
+    print(json.dumps(result, sort_keys=True))
+    sys.stdout.flush()
+    return result
+
+
+def benchmark(env, rows, categories, keep=False):
+    table = _create_source_table(env.cr, rows, categories)
+    sql_view = env['bi.sql.view'].create({
+        'name': 'Benchmark %d' % rows,
+        'technical_name': 'benchmark_%d' % rows,
+        'is_materialized': True,
+        'query': SOURCE_QUERY % table,
+    })
+    _measure(
+        env, 'button_validate_sql_expression', rows,
+        sql_view.button_validate_sql_expression)
+    sql_view.bi_sql_view_field_ids.filtered(
+        lambda x: x.name == 'x_category').write({'is_index': True})
+    _measure(
+        env, 'button_create_sql_view_and_model', rows,
+        sql_view.button_create_sql_view_and_model)
+    _measure(
+        env, '_refresh_materialized_view', rows,
+        sql_view._refresh_materialized_view)
+    model = env[sql_view.model_name]
+    _measure(
+        env, 'read_group', rows,
+        lambda: model.read_group(
+            [], ['x_category', 'x_amount'], ['x_category']))
+    _measure(
+        env, 'read_group_date', rows,
+        lambda: model.read_group(
+            [], ['x_sale_date', 'x_amount'], ['x_sale_date:month']))
+    if not keep:
+        sql_view.button_set_draft()
+        sql_view.unlink()
+        env.cr.execute("DROP TABLE %s" % table)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('-c', '--config', help="Odoo configuration file")
+    parser.add_argument('-d', '--database', required=True)
+    parser.add_argument(
+        '--rows', type=int, action='append',
+        help="Size of a generated source table. Can be repeated."
+        " Default: 1000000")
+    parser.add_argument(
+        '--categories', type=int, default=50,
+        help="Number of distinct values of the grouped column")
+    parser.add_argument(
+        '--commit', action='store_true',
+        help="Keep the generated tables and views, and commit the"
+        " transaction instead of rolling it back")
+    args = parser.parse_args(argv)
+
+    odoo_args = ['-d', args.database]
+    if args.config:
+        odoo_args += ['-c', args.config]
+    odoo.tools.config.parse_config(odoo_args)
+    registry = odoo.registry(args.database)
+    with api.Environment.manage(), registry.cursor() as cr:
+        env = api.Environment(cr, SUPERUSER_ID, {})
+        try:
+            for rows in args.rows or [1000000]:
+                benchmark(env, rows, args.categories, keep=args.commit)
+        finally:
+            if not args.commit:
+                cr.rollback()
+
+
+if __name__ == '__main__':
+    main()
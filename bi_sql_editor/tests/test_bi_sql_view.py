@@ -1,8 +1,9 @@
 # Copyright 2017 Onestein (<http://www.onestein.eu>)
 # License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl.html).
 
+from odoo import fields
 from odoo.tests.common import SingleTransactionCase, at_install, post_install
-from odoo.exceptions import AccessError, UserError
+from odoo.exceptions import AccessError, UserError, ValidationError
 
 
 @at_install(False)
@@ -68,6 +69,62 @@ class TestBiSqlViewEditor(SingleTransactionCase):
         self.assertEqual(
             copy_view.name, 'Partners View 2 (Copy)', 'Wrong name')
 
+    def test_refresh_policy(self):
+        view = self.view
+        self.assertTrue(view.last_refresh, 'last_refresh not set')
+        self.assertEqual(view.action_id.name, view.name,
+                         'action name should not change on refresh')
+        view.write({
+            'refresh_policy': 'on_read',
+            'max_age': 60,
+            'last_refresh': '2000-01-01 00:00:00',
+        })
+        self.assertTrue(view._is_stale(), 'view should be stale')
+        self.env[view.model_name].read_group([], ['x_name'], ['x_name'])
+        self.assertEqual(view.refresh_state, 'queued', 'refresh not queued')
+        self.bi_sql_view._process_refresh_queue()
+        self.assertEqual(view.refresh_state, 'done', 'refresh not done')
+        self.assertFalse(view._is_stale(), 'view should have been refreshed')
+
+    def test_refresh_queue(self):
+        view = self.view
+        view.button_refresh_materialized_view()
+        self.assertEqual(view.refresh_state, 'queued', 'refresh not queued')
+        self.assertEqual(view.refresh_user_id, self.env.user)
+        self.bi_sql_view._process_refresh_queue()
+        self.assertEqual(view.refresh_state, 'done', 'refresh not done')
+        self.assertTrue(view.refresh_end_date, 'refresh end date not set')
+
+    def test_refresh_queue_stuck(self):
+        view = self.view
+        view.write({
+            'refresh_state': 'running',
+            'refresh_start_date': fields.Datetime.now(),
+        })
+        self.bi_sql_view._process_refresh_queue()
+        self.assertEqual(view.refresh_state, 'running', 'refresh requeued')
+        view.refresh_start_date = '2000-01-01 00:00:00'
+        self.bi_sql_view._process_refresh_queue()
+        self.assertEqual(view.refresh_state, 'done', 'refresh not done')
+
+    def test_execution_settings(self):
+        view = self.view
+        cr = self.env.cr
+        cr.execute("SHOW work_mem")
+        previous_work_mem = cr.fetchone()[0]
+        view.write({'work_mem': '64MB', 'statement_timeout': 600})
+        with view._execution_settings():
+            cr.execute("SHOW work_mem")
+            self.assertEqual(cr.fetchone()[0], '64MB')
+            cr.execute("SHOW statement_timeout")
+            self.assertEqual(cr.fetchone()[0], '10min')
+        cr.execute("SHOW work_mem")
+        self.assertEqual(cr.fetchone()[0], previous_work_mem)
+        with self.assertRaises(ValidationError), cr.savepoint():
+            view.work_mem = '64 bananas'
+        view.invalidate_cache()
+        self.assertEqual(view.work_mem, '64MB')
+
     def test_security(self):
         with self.assertRaises(AccessError):
             self.bi_sql_view.sudo(self.no_bi_user.id).search(
@@ -77,6 +134,20 @@ class TestBiSqlViewEditor(SingleTransactionCase):
         self.assertEqual(len(bi), 1, 'Bi user should not have access to '
                                      'bi %s' % self.view.name)
 
+    def test_sql_type_mapping(self):
+        field_obj = self.env['bi.sql.view.field']
+        self.assertEqual(
+            field_obj._split_sql_type('numeric(16,2)'), ('numeric', [16, 2]))
+        self.assertEqual(
+            field_obj._split_sql_type('timestamp(3) without time zone'),
+            ('timestamp without time zone', [3]))
+        self.assertEqual(field_obj._split_sql_type('date'), ('date', []))
+        columns = self.view._get_columns_info()
+        self.assertEqual(
+            [x[1] for x in columns],
+            ['id', 'create_date', 'create_uid', 'write_date', 'write_uid',
+             'x_name', 'x_street', 'x_company_id'])
+
     def test_unlink(self):
         self.assertEqual(self.view.state, 'ui_valid', 'state not ui_valid')
         with self.assertRaises(UserError):
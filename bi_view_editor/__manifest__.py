@@ -9,7 +9,7 @@
     'license': 'AGPL-3',
     'website': 'https://github.com/OCA/reporting-engine',
     'category': 'Reporting',
-    'version': '11.0.1.0.0',
+    'version': '11.0.1.4.0',
     'depends': [
         'base',
         'web',
@@ -20,6 +20,8 @@
         'security/rules.xml',
         'templates/assets_template.xml',
         'views/bve_view.xml',
+        'views/bve_view_stat.xml',
+        'data/ir_cron.xml',
     ],
     'qweb': [
         'static/src/xml/bi_view_editor.xml'
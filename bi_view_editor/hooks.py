@@ -2,6 +2,7 @@
 # License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl).
 
 import logging
+import time
 
 from odoo import SUPERUSER_ID
 from odoo import api, modules
@@ -26,15 +27,16 @@ def post_load():
         # warning and error messages, while running an update all,
         # in case the model is a bi-view-generated model.
 
-        env = api.Environment(cr, SUPERUSER_ID, {})
+        start = time.time()
         table2model = {
-            model._table: name for name, model in env.items()
+            model._table: name for name, model in self.models.items()
             if not model._abstract and not _bi_view(name)  # here is the patch
         }
         missing_tables = set(table2model).difference(
             existing_tables(cr, table2model))
 
         if missing_tables:
+            env = api.Environment(cr, SUPERUSER_ID, {})
             missing = {table2model[table] for table in missing_tables}
             _logger.warning("Models have no table: %s.", ", ".join(missing))
             # recreate missing tables following model dependencies
@@ -48,13 +50,34 @@ def post_load():
                 existing_tables(cr, table2model))
             for table in missing_tables:
                 _logger.error("Model %s has no table.", table2model[table])
+        _logger.debug(
+            "Tables of %d models checked in %.3fs",
+            len(table2model), time.time() - start)
+
+    setup_models_orig = modules.registry.Registry.setup_models
+
+    def setup_models(self, cr):
+        # the operators of the measures of the BI views are read once
+        # per setup, see bve.view._get_group_operators()
+        start = time.time()
+        self._bve_group_operators = None
+        res = setup_models_orig(self, cr)
+        bve_models = sum(1 for name in self.models if _bi_view(name))
+        if bve_models:
+            _logger.info(
+                "Registry set up in %.3fs, with %d BI view models",
+                time.time() - start, bve_models)
+        return res
 
     modules.registry.Registry.check_tables_exist = check_tables_exist
+    modules.registry.Registry.setup_models = setup_models
 
 
 def uninstall_hook(cr, registry):
     # delete dirty data that could cause problems
     # while re-installing the module
+    env = api.Environment(cr, SUPERUSER_ID, {})
+    env['bve.view'].search([]).mapped('cron_id').unlink()
     cr.execute("""
         delete from ir_model where model like 'x_bve.%'
     """)
@@ -68,5 +91,12 @@ def uninstall_hook(cr, registry):
            AND table_name like 'x_bve_%'
     """)
     results = list(cr.fetchall())
+    cr.execute("""
+        SELECT 'DROP MATERIALIZED VIEW ' || matviewname
+          FROM pg_matviews
+         WHERE schemaname NOT IN ('pg_catalog', 'information_schema')
+           AND matviewname like 'x_bve_%'
+    """)
+    results += list(cr.fetchall())
     for result in results:
         cr.execute(result[0])
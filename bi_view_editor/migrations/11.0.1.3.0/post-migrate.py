@@ -0,0 +1,10 @@
+# Copyright 2015-2018 Onestein (<http://www.onestein.eu>)
+# License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl).
+
+
+def migrate(cr, version):
+    # the users of the BI views are not stored anymore
+    cr.execute("""
+        DELETE FROM ir_model_relation WHERE name = 'bve_view_res_users_rel'
+    """)
+    cr.execute("DROP TABLE IF EXISTS bve_view_res_users_rel")
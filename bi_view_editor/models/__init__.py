@@ -2,4 +2,7 @@
 
 from . import models
 from . import bve_view
+from . import bve_view_index
 from . import ir_model
+from . import ir_model_fields
+from . import bve_view_stat
@@ -2,27 +2,136 @@
 # License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl).
 
 import json
+import logging
+import re
+import time
 
-from odoo import api, fields, models, tools
+import psycopg2
+
+from odoo import SUPERUSER_ID, api, fields, models, registry, tools
 from odoo.exceptions import UserError
+from odoo.osv import expression
+from odoo.tools import sql
+from odoo.tools.safe_eval import safe_eval
 from odoo.tools.translate import _
 
 from odoo.addons.base_sparse_field.models.fields import Serialized
 
+from .models import clear_read_group_cache
+
+_logger = logging.getLogger(__name__)
+
+# Aggregate functions of the measures of the aggregated views, with the
+# operator used by read_group to aggregate their values again. An average
+# of the averages of several groups is not weighted by their number of
+# rows, so the averages are not aggregated again
+AGGREGATES = {
+    'sum': 'sum',
+    'avg': False,
+    'count': 'sum',
+    'min': 'min',
+    'max': 'max',
+}
+
+# Derived date columns: {derivation: (SQL expression, field type)}; the
+# periods are formatted as sortable labels, so that the views are grouped
+# by them without computing any date_trunc when read. Datetime columns are
+# stored in UTC, so are their periods, while read_group groups them in the
+# timezone of the user
+DERIVED_DATES = {
+    'day': ("to_char({}, 'YYYY-MM-DD')", 'char'),
+    'week': ("to_char({}, 'IYYY-\"W\"IW')", 'char'),
+    'month': ("to_char({}, 'YYYY-MM')", 'char'),
+    'quarter': ("to_char({}, 'YYYY-\"Q\"Q')", 'char'),
+    'year': ("to_char({}, 'YYYY')", 'char'),
+    'year_number': ("extract(year FROM {})::integer", 'integer'),
+}
+
+# Derived numeric columns: {derivation: SQL operator}
+DERIVED_OPERATORS = {
+    'add': '+',
+    'subtract': '-',
+    'multiply': '*',
+    'divide': '/',
+}
+
+
+# Default estimated number of rows of a BI view above which the editor
+# warns that the view may be slow, see get_cardinality_estimate()
+CARDINALITY_WARNING_THRESHOLD = 1000000
+
+# Table aliases and column names of the data of the views, written as is
+# in the queries
+TABLE_ALIAS_RE = re.compile(r'^t\d+\Z')
+COLUMN_NAME_RE = re.compile(r'^[A-Za-z0-9_]+\Z')
+
+
+def _alias_key(alias):
+    """ Sort key of the table aliases: t0, t1, ..., t9, t10 """
+    return len(alias), alias
+
 
 class BveView(models.Model):
     _name = 'bve.view'
     _description = 'BI View Editor'
 
-    @api.depends('group_ids')
+    @api.depends('group_ids', 'group_ids.users')
     @api.multi
     def _compute_users(self):
+        # the views without groups are public: their users are not listed,
+        # use _search_users to find the views visible to a user
+        for bve_view in self:
+            bve_view.user_ids = bve_view.sudo().group_ids.mapped('users')
+
+    @api.model
+    def _search_users(self, operator, value):
+        """ Search the views visible to the given users: the views without
+            groups and the views with a group of one of these users.
+        """
+        if operator not in ('=', 'in'):
+            raise UserError(_('Unsupported search on the users of the '
+                              'BI views: %s') % operator)
+        if not value:
+            return expression.FALSE_DOMAIN
+        user_ids = value if isinstance(value, (list, tuple)) else [value]
+        groups = self.env['res.users'].sudo().browse(user_ids).mapped(
+            'groups_id')
+        return ['|',
+                ('group_ids', '=', False),
+                ('group_ids', 'in', groups.ids)]
+
+    @api.depends('data')
+    @api.multi
+    def _compute_root_model(self):
+        for bve_view in self:
+            fields_data = json.loads(bve_view.data or '[]')
+            aliases = [f['table_alias'] for f in fields_data
+                       if 'join_node' not in f]
+            if not aliases:
+                bve_view.root_model = False
+                continue
+            root = min(aliases, key=_alias_key)
+            bve_view.root_model = [
+                f['model'] for f in fields_data
+                if f['table_alias'] == root and 'join_node' not in f][0]
+
+    @api.multi
+    def _compute_stats(self):
+        tables = {
+            bve_view.id: bve_view.model_name.replace('.', '_')
+            for bve_view in self if bve_view.state == 'created'
+        }
+        stats = self.env['bve.view.stat'].sudo()._read_query_stats(
+            list(tables.values()))
         for bve_view in self:
-            group_ids = bve_view.sudo().group_ids
-            if group_ids:
-                bve_view.user_ids = group_ids.mapped('users')
-            else:
-                bve_view.user_ids = self.env['res.users'].sudo().search([])
+            bve_view.stat_available = stats is not None
+            vals = (stats or {}).get(tables.get(bve_view.id), {})
+            bve_view.stat_calls = vals.get('calls', 0)
+            bve_view.stat_mean_time = vals.get('mean_time', 0.0)
+            bve_view.stat_max_time = vals.get('max_time', 0.0)
+            bve_view.stat_rows = vals.get('rows', 0)
+            bve_view.stat_shared_blks_hit = vals.get('shared_blks_hit', 0)
+            bve_view.stat_shared_blks_read = vals.get('shared_blks_read', 0)
 
     @api.depends('name')
     @api.multi
@@ -40,6 +149,62 @@ class BveView(models.Model):
          ('created', 'Created')],
         default='draft',
         copy=False)
+    is_aggregated = fields.Boolean(
+        string='Aggregated',
+        help="Group the rows of the view in SQL: the fields used as row or "
+             "column, or displayed in the list, are the keys of the groups "
+             "and each measure is computed with its aggregate function. "
+             "A 'Count' measure gives the number of rows of each group.")
+    root_model = fields.Char(
+        compute='_compute_root_model',
+        help="Model of the first table of the query")
+    domain = fields.Char(
+        string='Filter',
+        default='[]',
+        help="Domain on the model of the first table of the query, "
+             "compiled into the WHERE clause of the view: only the rows "
+             "of the records matching it are read.")
+    is_materialized = fields.Boolean(
+        string='Materialized',
+        help="Store the rows of the view in a materialized view, refreshed "
+             "by a scheduled action, instead of computing them at each "
+             "read. The fields flagged as 'Index' are indexed.")
+    cron_id = fields.Many2one(
+        'ir.cron',
+        string='Refresh Cron',
+        readonly=True,
+        copy=False,
+        help="Scheduled action that refreshes the materialized view")
+    last_refresh = fields.Datetime(readonly=True, copy=False)
+    cache_ttl = fields.Integer(
+        string='Cache Duration (s)',
+        help="Keep the results of the pivot and graph views of the BI view "
+             "in memory for this number of seconds, for the users with the "
+             "same access rules. Leave 0 to disable the cache.")
+    index_ids = fields.One2many(
+        'bve.view.index',
+        'bve_view_id',
+        string='Index Suggestions',
+        copy=False)
+    stat_available = fields.Boolean(compute='_compute_stats')
+    stat_calls = fields.Float(
+        string='Calls', digits=(16, 0), compute='_compute_stats')
+    stat_mean_time = fields.Float(
+        string='Mean Time (ms)', digits=(16, 3), compute='_compute_stats')
+    stat_max_time = fields.Float(
+        string='Max Time (ms)', digits=(16, 3), compute='_compute_stats')
+    stat_rows = fields.Float(
+        string='Rows', digits=(16, 0), compute='_compute_stats')
+    stat_shared_blks_hit = fields.Float(
+        string='Shared Blocks Hit', digits=(16, 0), compute='_compute_stats')
+    stat_shared_blks_read = fields.Float(
+        string='Shared Blocks Read', digits=(16, 0),
+        compute='_compute_stats')
+    stat_ids = fields.One2many(
+        'bve.view.stat',
+        'bve_view_id',
+        string='Statistics History',
+        copy=False)
     data = Serialized(
         help="Use the special query builder to define the query "
              "to generate your report dataset. "
@@ -55,8 +220,10 @@ class BveView(models.Model):
     user_ids = fields.Many2many(
         'res.users',
         string='Users',
+        help="Users of the groups of the view; empty if the view has no "
+             "groups, since it is then visible to everyone.",
         compute='_compute_users',
-        store=True)
+        search='_search_users')
 
     _sql_constraints = [
         ('name_uniq',
@@ -93,6 +260,8 @@ class BveView(models.Model):
 
         fields_info = json.loads(self.data)
         view_fields = _get_field_list(fields_info)
+        if self.is_aggregated:
+            view_fields.append(_get_field_def('bve_count', 'measure'))
         return view_fields
 
     @api.multi
@@ -116,6 +285,8 @@ class BveView(models.Model):
         fields_info = json.loads(self.data)
 
         view_fields = _get_field_list(fields_info)
+        if self.is_aggregated:
+            view_fields.append(_get_field_def('bve_count'))
         return view_fields
 
     @api.multi
@@ -199,86 +370,285 @@ class BveView(models.Model):
     def _build_access_rules(self, model):
         self.ensure_one()
 
-        def group_ids_with_access(model_name, access_mode):
-            # pylint: disable=sql-injection
-            self.env.cr.execute('''SELECT
-                  g.id
+        def group_ids_with_read_access(model_names):
+            """ Return the groups having read access to all model_names """
+            self.env.cr.execute("""SELECT
+                  a.group_id
                 FROM
                   ir_model_access a
                   JOIN ir_model m ON (a.model_id=m.id)
                   JOIN res_groups g ON (a.group_id=g.id)
                 WHERE
-                  m.model=%s AND
+                  m.model IN %s AND
                   a.active = true AND
-                  a.perm_''' + access_mode, (model_name,))
-            res = self.env.cr.fetchall()
-            return [x[0] for x in res]
+                  a.perm_read = true
+                GROUP BY a.group_id
+                HAVING count(DISTINCT m.model) = %s""", (
+                tuple(model_names), len(model_names)))
+            return [x[0] for x in self.env.cr.fetchall()]
 
         info = json.loads(self.data)
         model_names = list(set([f['model'] for f in info]))
-        read_groups = set.intersection(*[set(
-            group_ids_with_access(model_name, 'read')
-        ) for model_name in model_names])
+        read_groups = group_ids_with_read_access(model_names)
 
         if not read_groups and not self.group_ids:
             raise UserError(_('Please select at least one group'
                               ' on the security tab.'))
 
         # read access
-        for group in read_groups:
-            self.env['ir.model.access'].sudo().create({
-                'name': 'read access to ' + self.model_name,
-                'model_id': model.id,
-                'group_id': group,
-                'perm_read': True,
-            })
+        access_vals = [{
+            'name': 'read access to ' + self.model_name,
+            'group_id': group,
+            'perm_read': True,
+        } for group in read_groups]
 
         # read and write access
-        for group in self.group_ids:
-            self.env['ir.model.access'].sudo().create({
-                'name': 'read-write access to ' + self.model_name,
-                'model_id': model.id,
-                'group_id': group.id,
-                'perm_read': True,
-                'perm_write': True,
-            })
+        access_vals += [{
+            'name': 'read-write access to ' + self.model_name,
+            'group_id': group.id,
+            'perm_read': True,
+            'perm_write': True,
+        } for group in self.group_ids]
+
+        model.sudo().write({
+            'access_ids': [(0, 0, vals) for vals in access_vals]})
 
     @api.model
-    def _create_sql_view(self):
+    def _check_sql_field_data(self, field_data, field):
+        """ Check that the entry field_data of the data of a view matches
+            the field, as its aliases and name are written in the query.
 
-        def get_fields_info(fields_data):
-            fields_info = []
-            for field_data in fields_data:
-                field = self.env['ir.model.fields'].browse(field_data['id'])
-                vals = {
-                    'table': self.env[field.model_id.model]._table,
-                    'table_alias': field_data['table_alias'],
-                    'select_field': field.name,
-                    'as_field': 'x_' + field_data['name'],
+            The name of the column is the name of the field, suffixed by
+            the editor when the field is added twice or derived.
+        """
+        aliases = [field_data['table_alias']]
+        if field_data.get('join_node'):
+            aliases.append(field_data['join_node'])
+        for alias in aliases:
+            if not isinstance(alias, str) or not TABLE_ALIAS_RE.match(alias):
+                raise UserError(_('Invalid table alias %s.') % alias)
+        name = field_data['name']
+        if not isinstance(field_data['id'], int) or not field.exists() or \
+                field_data.get('model', field.model) != field.model or \
+                not isinstance(name, str) or \
+                not COLUMN_NAME_RE.match(name) or \
+                not (name == field.name or
+                     name.startswith(field.name + '_')):
+            raise UserError(_('Invalid field %s.') % name)
+        if field_data.get('join_node') and (
+                field.ttype != 'many2one' or field.relation not in self.env):
+            raise UserError(_(
+                'The field %s can not be joined.') % field_data['name'])
+
+    @api.model
+    def _get_sql_fields_info(self, fields_data):
+        fields_info = []
+        for field_data in fields_data:
+            field = self.env['ir.model.fields'].browse(field_data['id'])
+            self._check_sql_field_data(field_data, field)
+            vals = {
+                'table': self.env[field.model_id.model]._table,
+                'table_alias': field_data['table_alias'],
+                'select_field': field.name,
+                'as_field': 'x_' + field_data['name'],
+                'join': False,
+                'model': field.model_id.model,
+                'measure': field_data.get('measure', False),
+                'aggregate': field_data.get('aggregate') or 'sum',
+                'name': field_data['name'],
+                'derived': field_data.get('derived'),
+                'operand': field_data.get('operand'),
+            }
+            if field_data.get('join_node'):
+                vals.update({
+                    'join': field_data['join_node'],
+                    'join_left': field_data.get('join_left', False),
+                })
+                # the joined alias is a table of the related model
+                fields_info.append({
+                    'table': self.env[field.relation]._table,
+                    'table_alias': field_data['join_node'],
                     'join': False,
-                    'model': field.model_id.model
-                }
-                if field_data.get('join_node'):
-                    vals.update({'join': field_data['join_node']})
-                fields_info.append(vals)
-            return fields_info
-
-        def get_join_nodes(info):
-            join_nodes = [
-                (f['table_alias'],
-                 f['join'],
-                 f['select_field']) for f in info if f['join'] is not False]
-            return join_nodes
-
-        def get_tables(info):
-            tables = set([(f['table'], f['table_alias']) for f in info])
-            return tables
+                    'model': field.relation,
+                    'join_node': True,
+                })
+            fields_info.append(vals)
+        return fields_info
+
+    @api.model
+    def _get_sql_expression(self, f, info):
+        """ Return the SQL expression of the output column f of info """
+        column = "{}.{}".format(f['table_alias'], f['select_field'])
+        derived = f.get('derived')
+        if not derived:
+            return column
+        if derived in DERIVED_DATES:
+            return DERIVED_DATES[derived][0].format(column)
+        if derived not in DERIVED_OPERATORS:
+            raise UserError(_('Unknown derived column %s of %s.') % (
+                derived, f['as_field']))
+        if not f.get('operand'):
+            raise UserError(_(
+                'The derived column %s has no operand.') % f['as_field'])
+        operands = [
+            o for o in info
+            if 'join_node' not in o and o['name'] == f['operand'] and
+            not o.get('derived') and o['join'] is False]
+        if not operands:
+            raise UserError(_(
+                'The operand %s of the derived column %s is not a field '
+                'of the query.') % (f['operand'], f['as_field']))
+        operand = "{}.{}".format(
+            operands[0]['table_alias'], operands[0]['select_field'])
+        if derived == 'divide':
+            operand = "NULLIF({}, 0)".format(operand)
+        return "({}::float8 {} {})".format(
+            column, DERIVED_OPERATORS[derived], operand)
+
+    @api.model
+    def _prune_sql_fields_info(self, info):
+        """ Remove from info the aliases that are only joined to reach
+            other aliases, when they no longer lead anywhere.
+
+            An alias is pruned when it has no output column, when it is
+            joined by a single many2one of its parent, and when this join can
+            not change the number of rows: it is a LEFT JOIN, or an INNER
+            JOIN on a NOT NULL column with a foreign key to the table of the
+            alias, which guarantees a match. The many2one fields to models
+            without table, such as SQL views, have no foreign key.
+            Pruning is repeated, since pruning an alias may leave its parent
+            as a leaf.
+        """
+        aliases = set(f['table_alias'] for f in info)
+        if not aliases:
+            return info
+        root = min(aliases, key=_alias_key)
+        output_aliases = set(
+            f['table_alias'] for f in info
+            if 'join_node' not in f and f['join'] is False)
+        joins = [f for f in info if f['join'] is not False]
+        tables = {
+            f['table_alias']: f['table'] for f in info if 'join_node' in f}
+        matched = {}
+
+        def _always_matches(table, column, foreign_table):
+            key = (table, column, foreign_table)
+            if key not in matched:
+                self.env.cr.execute("""
+                    SELECT a.attnotnull
+                      FROM pg_attribute a
+                      JOIN pg_class c ON c.oid = a.attrelid
+                      JOIN pg_constraint k ON k.conrelid = c.oid
+                       AND k.contype = 'f' AND k.conkey = ARRAY[a.attnum]
+                      JOIN pg_class f ON f.oid = k.confrelid
+                     WHERE c.relname = %s AND a.attname = %s
+                       AND f.relname = %s
+                       AND pg_table_is_visible(c.oid)
+                       AND pg_table_is_visible(f.oid)""", key)
+                res = self.env.cr.fetchone()
+                matched[key] = bool(res and res[0])
+            return matched[key]
+
+        pruned = set()
+        changed = True
+        while changed:
+            changed = False
+            for alias in sorted(aliases - output_aliases - pruned - {root},
+                                key=_alias_key):
+                alias_joins = [
+                    f for f in joins
+                    if alias in (f['table_alias'], f['join']) and
+                    not {f['table_alias'], f['join']} & pruned]
+                if len(alias_joins) != 1:
+                    continue
+                join = alias_joins[0]
+                # only a many2one of the parent matches at most one row
+                if join['join'] != alias:
+                    continue
+                if not join['join_left'] and not _always_matches(
+                        join['table'], join['select_field'], tables[alias]):
+                    continue
+                pruned.add(alias)
+                changed = True
+        return [
+            f for f in info
+            if f['table_alias'] not in pruned and f['join'] not in pruned]
+
+    @api.model
+    def _get_sql_joins(self, info):
+        """ Return the root alias of the query and the list of the joins,
+            as tuples (join type, table, alias, [conditions]).
+
+            The joins follow a breadth first walk of the join tree from the
+            first alias (t0), the aliases at the same depth being joined in
+            their order (t1, t2, ..., t10), so that the query only depends
+            on the data of the view. Each join node is an INNER JOIN, unless
+            it is flagged as LEFT JOIN.
+        """
+        tables = {}
+        edges = {}
+        for f in info:
+            tables.setdefault(f['table_alias'], f['table'])
+            if f['join'] is False:
+                continue
+            condition = "{}.{} = {}.id".format(
+                f['table_alias'], f['select_field'], f['join'])
+            for alias, other in [(f['table_alias'], f['join']),
+                                 (f['join'], f['table_alias'])]:
+                edges.setdefault(alias, []).append(
+                    (other, condition, f['join_left']))
+
+        root = min(tables, key=_alias_key)
+        visited = {root}
+        queue = [root]
+        joins = []
+        while queue:
+            alias = queue.pop(0)
+            neighbours = set(e[0] for e in edges.get(alias, [])) - visited
+            for other in sorted(neighbours, key=_alias_key):
+                conditions = [e for e in edges[other] if e[0] in visited]
+                visited.add(other)
+                queue.append(other)
+                join_type = 'INNER JOIN'
+                if any(e[2] for e in conditions):
+                    join_type = 'LEFT JOIN'
+                joins.append((join_type, tables[other], other,
+                              [e[1] for e in conditions]))
+        if visited != set(tables):
+            raise UserError(_(
+                'The models of the tables %s can not be joined with the '
+                'other models of the query.') % ', '.join(
+                sorted(set(tables) - visited, key=_alias_key)))
+        return root, joins
+
+    @api.multi
+    def _build_sql_query(self):
+        """ Return the SELECT query of the view, with explicit joins """
+        self.ensure_one()
 
         def get_fields(info):
-            return [("{}.{}".format(f['table_alias'],
-                                    f['select_field']),
+            return [(self._get_sql_expression(f, info),
                      f['as_field']) for f in info if 'join_node' not in f]
 
+        def get_aggregated_fields(info):
+            group_fields = []
+            measure_fields = []
+            for f in info:
+                if 'join_node' in f or f['join'] is not False:
+                    continue
+                select_field = self._get_sql_expression(f, info)
+                if not f['measure']:
+                    group_fields.append((select_field, f['as_field']))
+                    continue
+                if f['aggregate'] not in AGGREGATES:
+                    raise UserError(_(
+                        'Unknown aggregate function %s of the measure %s.'
+                    ) % (f['aggregate'], f['as_field']))
+                measure_fields.append((
+                    "{}({})".format(f['aggregate'], select_field),
+                    f['as_field']))
+            return group_fields, measure_fields
+
         def check_empty_data(data):
             if not data or data == '[]':
                 raise UserError(_('No data to process.'))
@@ -286,34 +656,319 @@ class BveView(models.Model):
         check_empty_data(self.data)
 
         formatted_data = json.loads(self.data)
-        info = get_fields_info(formatted_data)
-        select_fields = get_fields(info)
-        tables = get_tables(info)
-        join_nodes = get_join_nodes(info)
+        info = self._prune_sql_fields_info(
+            self._get_sql_fields_info(formatted_data))
+        root, joins = self._get_sql_joins(info)
+        root_table = [f['table'] for f in info if f['table_alias'] == root][0]
+
+        root_model = [f['model'] for f in info if f['table_alias'] == root][0]
+        where = self._get_sql_filter(root, root_model)
+
+        group_by = ''
+        if self.is_aggregated:
+            group_fields, measure_fields = get_aggregated_fields(info)
+            group_keys = ', '.join([f[0] for f in group_fields])
+            basic_fields = [
+                ("row_number() OVER ({})".format(
+                    group_keys and 'ORDER BY ' + group_keys), "id"),
+                ("count(*)", "x_bve_count")
+            ]
+            select_fields = group_fields + measure_fields
+            if group_keys:
+                group_by = "GROUP BY {}".format(group_keys)
+        else:
+            basic_fields = [
+                ("{}.id".format(root), "id")
+            ]
+            select_fields = get_fields(info)
+        return """SELECT
+                {}
+            FROM {} AS {}
+            {}
+            {}
+            {}""".format(
+            ',\n                '.join(
+                ["{} AS {}".format(f[0], f[1])
+                 for f in basic_fields + select_fields]),
+            root_table, root,
+            '\n            '.join(
+                ["{} {} AS {} ON ({})".format(
+                    j[0], j[1], j[2], ' AND '.join(j[3]))
+                 for j in joins]),
+            where,
+            group_by)
+
+    @api.multi
+    def _get_sql_filter(self, root, root_model):
+        """ Return the WHERE clause of the view, restricting the rows of
+            the root alias to the records of root_model matching the domain
+            of the view, or an empty string if there is no domain.
+
+            The domain is compiled by the ORM into a subquery whose
+            parameters are quoted by psycopg2, since the definition of a
+            view can not hold query parameters.
+        """
+        self.ensure_one()
+        try:
+            domain = safe_eval(self.domain or '[]')
+        except Exception as e:
+            raise UserError(_('Invalid filter %s: %s') % (self.domain, e))
+        if not domain:
+            return ''
+        Model = self.env[root_model].with_context(active_test=False)
+        try:
+            query = Model._where_calc(domain)
+        except ValueError as e:
+            raise UserError(_('Invalid filter %s: %s') % (self.domain, e))
+        from_clause, where_clause, params = query.get_sql()
+        subquery = 'SELECT "{}".id FROM {} WHERE {}'.format(
+            Model._table, from_clause, where_clause or 'TRUE')
+        subquery = self.env.cr.mogrify(subquery, params).decode('utf-8')
+        return "WHERE {}.id IN ({})".format(root, subquery)
+
+    @api.multi
+    def _get_sql_index_candidates(self):
+        """ Return the columns the view joins or filters on, that could
+            use an index, as {(table, column): reason}.
+        """
+        self.ensure_one()
+        info = self._prune_sql_fields_info(
+            self._get_sql_fields_info(json.loads(self.data)))
+        candidates = {}
+        for f in info:
+            if f['join'] is not False:
+                candidates.setdefault((f['table'], f['select_field']), 'join')
+        root, _joins = self._get_sql_joins(info)
+        root_model = [f['model'] for f in info if f['table_alias'] == root][0]
+        Model = self.env[root_model]
+        for leaf in safe_eval(self.domain or '[]'):
+            # constant leaves such as (1, '=', 1) have no field
+            if not isinstance(leaf, (list, tuple)) or len(leaf) != 3 or \
+                    not isinstance(leaf[0], str):
+                continue
+            field = Model._fields.get(leaf[0].split('.')[0])
+            if field and field.store and field.column_type:
+                candidates.setdefault((Model._table, field.name), 'filter')
+        return {
+            key: reason for key, reason in candidates.items()
+            if key[1] != 'id'}
+
+    @api.multi
+    def action_analyze_indexes(self):
+        """ Suggest an index on each column the view joins or filters on
+            that is not the first column of an index, with the cost of the
+            sequential scans of its table in the plan of the view.
+        """
+        for bve_view in self:
+            query = bve_view._build_sql_query()
+            # pylint: disable=sql-injection
+            self.env.cr.execute('EXPLAIN (FORMAT JSON) ' + query)
+            plan = self.env.cr.fetchone()[0][0]['Plan']
+            suggestions = self.env['bve.view.index']._prepare_suggestions(
+                bve_view._get_sql_index_candidates(), plan)
+            bve_view.index_ids.unlink()
+            bve_view.write({
+                'index_ids': [(0, 0, vals) for vals in suggestions],
+            })
+
+    @api.model
+    def get_cardinality_estimate(self, data, is_aggregated=False,
+                                 domain='[]'):
+        """ Return the number of rows and the cost of the query of a BI view
+            with data, as estimated by EXPLAIN, and whether the number of
+            rows is above the threshold of the system parameter
+            bi_view_editor.cardinality_warning_threshold.
+
+            Called by the editor after each change of the fields, so that
+            the joins multiplying the rows are noticed before the view is
+            generated; the estimate is empty while the query is incomplete
+            or when data does not match the fields it refers to.
+        """
+        res = {'rows': False, 'cost': False, 'warning': False}
+        bve_view = self.new({
+            'data': data,
+            'is_aggregated': is_aggregated,
+            'domain': domain or '[]',
+        })
+        try:
+            query = bve_view._build_sql_query()
+            with self.env.cr.savepoint():
+                # pylint: disable=sql-injection
+                self.env.cr.execute('EXPLAIN (FORMAT JSON) ' + query)
+                plan = self.env.cr.fetchone()[0][0]['Plan']
+        except (UserError, ValueError, KeyError, psycopg2.Error):
+            return res
+        try:
+            threshold = int(self.env['ir.config_parameter'].sudo().get_param(
+                'bi_view_editor.cardinality_warning_threshold',
+                CARDINALITY_WARNING_THRESHOLD))
+        except ValueError:
+            threshold = CARDINALITY_WARNING_THRESHOLD
+        res.update({
+            'rows': plan['Plan Rows'],
+            'cost': plan['Total Cost'],
+            'warning': plan['Plan Rows'] > threshold,
+        })
+        return res
+
+    @api.model
+    def _get_group_operators(self, model_name):
+        """ Return the operators used by read_group on the measures of the
+            aggregated view of model_name, as {field name: operator}.
+
+            This is called for each BI view model while the registry is set
+            up, so the operators of all the views are read at once and kept
+            on the registry until its next setup.
+        """
+        operators = getattr(self.pool, '_bve_group_operators', None)
+        if operators is None:
+            operators = self._read_group_operators()
+            self.pool._bve_group_operators = operators
+        return operators.get(model_name, {})
+
+    @api.model
+    def _read_group_operators(self):
+        """ Return the operators of the measures of all the aggregated
+            views, as {model name: {field name: operator}}.
+
+            This is called while the registry is set up, possibly before
+            the columns of bve_view are updated, hence the SQL query.
+        """
+        cr = self.env.cr
+        if not sql.column_exists(cr, self._table, 'is_aggregated'):
+            return {}
+        cr.execute("""SELECT model_name, data FROM bve_view
+            WHERE is_aggregated""")
+        res = {}
+        for model_name, data in cr.fetchall():
+            operators = res.setdefault(model_name, {})
+            fields_data = json.loads(data or '[]')
+            if not isinstance(fields_data, list):
+                fields_data = json.loads(fields_data or '[]')
+            for field_data in fields_data:
+                if field_data.get('measure'):
+                    aggregate = field_data.get('aggregate') or 'sum'
+                    operators['x_' + field_data['name']] = AGGREGATES.get(
+                        aggregate, 'sum')
+        return res
+
+    @api.model
+    def _drop_sql_view(self, table_name):
+        """ Drop the view or the materialized view table_name, if any """
+        kind = sql.table_kind(self.env.cr, table_name)
+        if kind == 'v':
+            tools.drop_view_if_exists(self.env.cr, table_name)
+        elif kind == 'm':
+            # pylint: disable=sql-injection
+            self.env.cr.execute(
+                'DROP MATERIALIZED VIEW IF EXISTS "%s"' % table_name)
 
+    @api.model
+    def _create_sql_view(self):
+        query = self._build_sql_query()
         table_name = self.model_name.replace('.', '_')
 
         # robustness in case something went wrong
         # pylint: disable=sql-injection
         self._cr.execute('DROP TABLE IF EXISTS "%s"' % table_name)
+        self._drop_sql_view(table_name)
 
-        basic_fields = [
-            ("t0.id", "id")
-        ]
-        # pylint: disable=sql-injection
-        q = """CREATE or REPLACE VIEW %s as (
-            SELECT %s
-            FROM  %s
-            WHERE %s
-            )""" % (table_name, ','.join(
-            ["{} AS {}".format(f[0], f[1])
-             for f in basic_fields + select_fields]), ','.join(
-            ["{} AS {}".format(t[0], t[1])
-             for t in list(tables)]), " AND ".join(
-            ["{}.{} = {}.id".format(j[0], j[2], j[1])
-             for j in join_nodes] + ["TRUE"]))
+        if not self.is_materialized:
+            # pylint: disable=sql-injection
+            q = """CREATE or REPLACE VIEW %s as (
+                %s
+                )""" % (table_name, query)
+            self.env.cr.execute(q)
+            return
 
+        # pylint: disable=sql-injection
+        q = """CREATE MATERIALIZED VIEW %s as (
+            %s
+            )""" % (table_name, query)
         self.env.cr.execute(q)
+        self.last_refresh = fields.Datetime.now()
+        index_fields = ['id'] + [
+            'x_' + f['name'] for f in json.loads(self.data)
+            if f.get('index') and 'join_node' not in f]
+        for index_field in index_fields:
+            # pylint: disable=sql-injection
+            self.env.cr.execute('CREATE INDEX "%s_%s_index" ON %s (%s)' % (
+                table_name, index_field, table_name, index_field))
+
+    @api.multi
+    def _prepare_cron(self):
+        self.ensure_one()
+        return {
+            'name': _('Refresh BI View %s') % self.name,
+            'user_id': SUPERUSER_ID,
+            'model_id': self.env['ir.model'].sudo().search([
+                ('model', '=', self._name)], limit=1).id,
+            'state': 'code',
+            'code': 'model._refresh_materialized_view_cron(%s)' % self.ids,
+            'interval_number': 1,
+            'interval_type': 'days',
+            'numbercall': -1,
+        }
+
+    @api.model
+    def _refresh_materialized_view_cron(self, view_ids):
+        bve_views = self.search([
+            ('is_materialized', '=', True),
+            ('state', '=', 'created'),
+            ('id', 'in', view_ids),
+        ])
+        return bve_views.action_refresh()
+
+    @api.multi
+    def action_refresh(self):
+        for bve_view in self.filtered('is_materialized'):
+            table_name = bve_view.model_name.replace('.', '_')
+            # pylint: disable=sql-injection
+            self.env.cr.execute(
+                'REFRESH MATERIALIZED VIEW %s' % table_name)
+            bve_view.last_refresh = fields.Datetime.now()
+            clear_read_group_cache(self.env.cr.dbname, bve_view.model_name)
+
+    @api.model
+    def _get_cache_ttl(self, model_name):
+        """ Return the duration of the read_group cache of the BI view
+            model_name, in seconds (0 if disabled). It is kept in memory
+            for CACHE_TTL_REFRESH seconds by read_group.
+        """
+        self.env.cr.execute(
+            "SELECT cache_ttl FROM bve_view WHERE model_name = %s",
+            (model_name,))
+        res = self.env.cr.fetchone()
+        return res and res[0] or 0
+
+    @api.model
+    def create(self, vals):
+        self.pool._bve_group_operators = None
+        return super(BveView, self).create(vals)
+
+    @api.multi
+    def write(self, vals):
+        cached_fields = {'name', 'cache_ttl', 'data', 'is_aggregated',
+                         'domain'}
+        model_names = set()
+        if set(vals) & cached_fields:
+            model_names = set(self.mapped('model_name'))
+        res = super(BveView, self).write(vals)
+        if set(vals) & {'name', 'data', 'is_aggregated'}:
+            self.pool._bve_group_operators = None
+        # the results and the cache duration of the renamed views are
+        # dropped under their former name as well
+        for model_name in model_names | set(self.mapped('model_name')):
+            clear_read_group_cache(self.env.cr.dbname, model_name)
+        return res
+
+    @api.multi
+    def action_stats_history(self):
+        self.ensure_one()
+        action = self.env.ref(
+            'bi_view_editor.action_bve_view_stat').read()[0]
+        action['domain'] = [('bve_view_id', '=', self.id)]
+        return action
 
     @api.multi
     def action_translations(self):
@@ -345,62 +1000,132 @@ class BveView(models.Model):
         }
 
     @api.multi
-    def action_create(self):
+    def _prepare_field(self, field_data):
+        """ Return the values of the ir.model.fields of the column of the
+            BI view for field_data.
+        """
         self.ensure_one()
-
-        def _prepare_field(field_data):
-            if not field_data['custom']:
-                field = self.env['ir.model.fields'].browse(field_data['id'])
-                vals = {
-                    'name': 'x_' + field_data['name'],
-                    'complete_name': field.complete_name,
-                    'model': self.model_name,
-                    'relation': field.relation,
-                    'field_description': field_data.get(
-                        'description', field.field_description),
-                    'ttype': field.ttype,
-                    'selection': field.selection,
-                    'size': field.size,
-                    'state': 'manual',
-                    'readonly': True
-                }
-                if vals['ttype'] == 'monetary':
+        if not field_data['custom']:
+            field = self.env['ir.model.fields'].browse(field_data['id'])
+            vals = {
+                'name': 'x_' + field_data['name'],
+                'complete_name': field.complete_name,
+                'model': self.model_name,
+                'relation': field.relation,
+                'field_description': field_data.get(
+                    'description', field.field_description),
+                'ttype': field.ttype,
+                'selection': field.selection,
+                'size': field.size,
+                'state': 'manual',
+                'readonly': True
+            }
+            if vals['ttype'] == 'monetary':
+                vals.update({'ttype': 'float'})
+            derived = field_data.get('derived')
+            if derived:
+                vals.update({
+                    'ttype': DERIVED_DATES.get(
+                        derived, (False, 'float'))[1],
+                    'relation': False,
+                    'selection': False,
+                })
+            if derived in DERIVED_DATES and field.ttype == 'datetime':
+                vals['help'] = _(
+                    "Computed from the date and time in UTC: near midnight "
+                    "it may differ from the grouping by %s of the field, "
+                    "done in the timezone of the user.") % field.name
+            if self.is_aggregated and field_data.get('measure'):
+                aggregate = field_data.get('aggregate') or 'sum'
+                if aggregate == 'count':
+                    vals.update({'ttype': 'integer'})
+                elif aggregate == 'avg':
                     vals.update({'ttype': 'float'})
-                if field.ttype == 'selection' and not field.selection:
-                    model_obj = self.env[field.model_id.model]
-                    selection = model_obj._fields[field.name].selection
-                    if callable(selection):
-                        selection_domain = selection(model_obj)
-                    else:
-                        selection_domain = selection
-                    vals.update({'selection': str(selection_domain)})
-                return vals
-
-        # clean dirty view (in case something went wrong)
-        self.action_reset()
-
-        # create sql view
-        self._create_sql_view()
-
-        # create model and fields
+            if field.ttype == 'selection' and not field.selection:
+                model_obj = self.env[field.model_id.model]
+                selection = model_obj._fields[field.name].selection
+                if callable(selection):
+                    selection_domain = selection(model_obj)
+                else:
+                    selection_domain = selection
+                vals.update({'selection': str(selection_domain)})
+            return vals
+
+    @api.multi
+    def _create_bve_model(self):
+        """ Create the model and the fields of the BI view, without loading
+            them in the registry.
+        """
+        self.ensure_one()
         data = json.loads(self.data)
         model_vals = {
             'name': self.name,
             'model': self.model_name,
             'state': 'manual',
             'field_id': [
-                (0, 0, _prepare_field(field))
+                (0, 0, self._prepare_field(field))
                 for field in data
                 if 'join_node' not in field]
         }
-        Model = self.env['ir.model'].sudo().with_context(bve=True)
-        model = Model.create(model_vals)
+        if self.is_aggregated:
+            model_vals['field_id'].append((0, 0, {
+                'name': 'x_bve_count',
+                'model': self.model_name,
+                'field_description': _('Count'),
+                'ttype': 'integer',
+                'state': 'manual',
+                'readonly': True
+            }))
+        Model = self.env['ir.model'].sudo().with_context(
+            bve=True, bve_defer_setup=True)
+        return Model.create(model_vals)
+
+    @api.multi
+    def action_create(self):
+        """ Generate the BI views of the recordset; the registry is set up
+            and reloaded once for all of them, after their models are
+            created, and before their UI views are checked against them.
+        """
+        if not self:
+            return
+        start = time.time()
+
+        # clean dirty views (in case something went wrong)
+        self._reset()
+
+        # create sql views, models and fields
+        bve_models = {}
+        for bve_view in self:
+            bve_view._create_sql_view()
+            bve_models[bve_view] = bve_view._create_bve_model()
+        _logger.info(
+            "BI views %s: SQL views and models created in %.3fs",
+            self.ids, time.time() - start)
+
+        # setup models; this loads the new custom models in registry
+        phase_start = time.time()
+        self.pool.setup_models(self._cr)
+        # signal that registry has changed
+        registry(self.env.cr.dbname).signal_changes()
+        _logger.info(
+            "BI views %s: registry set up in %.3fs",
+            self.ids, time.time() - phase_start)
 
-        # give access rights
-        self._build_access_rules(model)
+        phase_start = time.time()
+        for bve_view in self:
+            # give access rights
+            bve_view._build_access_rules(bve_models[bve_view])
 
-        # create tree, graph and pivot views
-        self._create_bve_view()
+            # create tree, graph and pivot views
+            bve_view._create_bve_view()
+
+            if bve_view.is_materialized:
+                bve_view.cron_id = self.env['ir.cron'].sudo().create(
+                    bve_view._prepare_cron())
+        _logger.info(
+            "BI views %s: access rules and views created in %.3fs "
+            "(%.3fs in total)",
+            self.ids, time.time() - phase_start, time.time() - start)
 
     @api.multi
     def open_view(self):
@@ -409,6 +1134,90 @@ class BveView(models.Model):
         action['display_name'] = _('BI View')
         return action
 
+    @api.multi
+    def _prepare_sql_view_field(self, field_data, field_vals):
+        """ Return the values of the bi.sql.view.field of the column of the
+            BI view for field_data, from the values of its ir.model.fields.
+        """
+        self.ensure_one()
+        ttypes = dict(
+            self.env['bi.sql.view.field']._fields['ttype'].selection)
+        vals = {
+            'field_description': field_vals['field_description'],
+            'is_index': bool(field_data.get('index')),
+            'is_group_by': bool(
+                field_data.get('row') or field_data.get('column')),
+        }
+        if field_vals['ttype'] in ttypes:
+            vals['ttype'] = field_vals['ttype']
+        if field_vals['ttype'] == 'many2one':
+            vals['many2one_model_id'] = self.env['ir.model'].search([
+                ('model', '=', field_vals['relation'])], limit=1).id
+        if field_vals['ttype'] == 'selection':
+            vals['selection'] = field_vals['selection']
+        if field_data.get('measure'):
+            vals['graph_type'] = 'measure'
+        elif field_data.get('row'):
+            vals['graph_type'] = 'row'
+        elif field_data.get('column'):
+            vals['graph_type'] = 'col'
+        if not field_data.get('list'):
+            vals['tree_visibility'] = 'hidden'
+        return vals
+
+    @api.multi
+    def action_export_sql_view(self):
+        """ Create a materialized bi.sql.view with the query of the BI view,
+            so that it is indexed and refreshed by the SQL editor.
+        """
+        self.ensure_one()
+        if 'bi.sql.view' not in self.env:
+            raise UserError(_(
+                'The module BI SQL Editor (bi_sql_editor) must be installed '
+                'to export a BI view.'))
+        technical_name = 'bve_' + self.model_name[6:].replace('.', '_')
+        SqlView = self.env['bi.sql.view']
+        if SqlView.search([('technical_name', '=', technical_name)]):
+            raise UserError(_(
+                'The BI view %s is already exported as the SQL view %s.'
+            ) % (self.name, technical_name))
+
+        # the SQL editor numbers the rows itself, and only the columns of
+        # the fields of the model of the view are exported, without the
+        # foreign keys of its joins
+        query = self._build_sql_query()
+        data = json.loads(self.data)
+        columns = [
+            'x_' + field_data['name'] for field_data in data
+            if 'join_node' not in field_data]
+        if self.is_aggregated:
+            columns.append('x_bve_count')
+        sql_view = SqlView.create({
+            'name': self.name,
+            'technical_name': technical_name,
+            'is_materialized': True,
+            'query': 'SELECT\n    {}\nFROM ({}) AS bve'.format(
+                ',\n    '.join('bve.' + column for column in columns),
+                query),
+            'group_ids': [(6, 0, self.group_ids.ids)],
+        })
+        sql_view.button_validate_sql_expression()
+
+        for field_data in data:
+            if 'join_node' in field_data or field_data['custom']:
+                continue
+            field_vals = self._prepare_field(field_data)
+            sql_view.bi_sql_view_field_ids.filtered(
+                lambda x: x.name == field_vals['name']).write(
+                self._prepare_sql_view_field(field_data, field_vals))
+        return {
+            'type': 'ir.actions.act_window',
+            'res_model': 'bi.sql.view',
+            'res_id': sql_view.id,
+            'view_mode': 'form',
+            'target': 'current',
+        }
+
     @api.multi
     def copy(self, default=None):
         self.ensure_one()
@@ -416,34 +1225,51 @@ class BveView(models.Model):
         return super(BveView, self).copy(default=default)
 
     @api.multi
-    def action_reset(self):
-        self.ensure_one()
-
+    def _reset(self):
+        """ Remove the UI, the models and the SQL views of the BI views.
+            The models are removed at once, with a single registry setup.
+            Return whether menus were removed.
+        """
         has_menus = False
-        if self.action_id:
-            action = 'ir.actions.act_window,%d' % (self.action_id.id,)
-            menus = self.env['ir.ui.menu'].sudo().search([
-                ('action', '=', action)
-            ])
-            has_menus = True if menus else False
-            menus.unlink()
-
-            if self.action_id.view_id:
-                self.action_id.view_id.sudo().unlink()
-            self.action_id.sudo().unlink()
-
-        self.env['ir.ui.view'].sudo().search(
-            [('model', '=', self.model_name)]).unlink()
+        for bve_view in self:
+            if bve_view.action_id:
+                action = 'ir.actions.act_window,%d' % (bve_view.action_id.id,)
+                menus = self.env['ir.ui.menu'].sudo().search([
+                    ('action', '=', action)
+                ])
+                has_menus = has_menus or bool(menus)
+                menus.unlink()
+
+                if bve_view.action_id.view_id:
+                    bve_view.action_id.view_id.sudo().unlink()
+                bve_view.action_id.sudo().unlink()
+
+            self.env['ir.ui.view'].sudo().search(
+                [('model', '=', bve_view.model_name)]).unlink()
+
+            if bve_view.cron_id:
+                bve_view.cron_id.sudo().unlink()
+
         ir_models = self.env['ir.model'].sudo().search([
-            ('model', '=', self.model_name)
+            ('model', 'in', self.mapped('model_name'))
         ])
-        for model in ir_models:
-            model.unlink()
+        if ir_models:
+            ir_models.unlink()
 
-        table_name = self.model_name.replace('.', '_')
-        tools.drop_view_if_exists(self.env.cr, table_name)
+        for bve_view in self:
+            table_name = bve_view.model_name.replace('.', '_')
+            bve_view._drop_sql_view(table_name)
+
+        for bve_view in self:
+            clear_read_group_cache(self.env.cr.dbname, bve_view.model_name)
+        self.write({'state': 'draft', 'last_refresh': False})
+        return has_menus
+
+    @api.multi
+    def action_reset(self):
+        self.ensure_one()
 
-        self.state = 'draft'
+        has_menus = self._reset()
 
         if has_menus:
             return {'type': 'ir.actions.client', 'tag': 'reload'}
@@ -0,0 +1,166 @@
+# Copyright 2015-2018 Onestein (<http://www.onestein.eu>)
+# License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl).
+
+from odoo import api, fields, models
+from odoo.exceptions import AccessError, UserError
+from odoo.tools import sql
+from odoo.tools.translate import _
+
+# Size of a btree index entry besides the key: the index tuple header
+# and the line pointer, in bytes
+INDEX_ENTRY_OVERHEAD = 12
+
+# Default fill factor of the leaf pages of a btree index
+INDEX_FILLFACTOR = 0.9
+
+
+def _estimate_index_size(rows, width):
+    """ Return the estimated size in kB of a btree index on a column of
+        the given average width, over rows rows.
+    """
+    entry_size = (width + INDEX_ENTRY_OVERHEAD + 7) // 8 * 8
+    return int(rows * entry_size / INDEX_FILLFACTOR / 1024)
+
+
+class BveViewIndex(models.Model):
+    _name = 'bve.view.index'
+    _description = 'BI View Editor Index Suggestion'
+    _order = 'scan_cost desc, table_name, column_name'
+
+    @api.depends('table_name', 'column_name')
+    @api.multi
+    def _compute_index_name(self):
+        for index in self:
+            index.index_name = '%s_%s_index' % (
+                index.table_name, index.column_name)
+
+    bve_view_id = fields.Many2one(
+        'bve.view',
+        string='BI View',
+        required=True,
+        ondelete='cascade')
+    table_name = fields.Char(string='Table', required=True, readonly=True)
+    column_name = fields.Char(string='Column', required=True, readonly=True)
+    index_name = fields.Char(compute='_compute_index_name')
+    reason = fields.Selection(
+        [('join', 'Join'),
+         ('filter', 'Filter')],
+        required=True,
+        readonly=True)
+    estimated_rows = fields.Float(
+        digits=(16, 0),
+        readonly=True,
+        help="Number of rows of the table estimated by PostgreSQL")
+    scan_cost = fields.Float(
+        digits=(16, 2),
+        readonly=True,
+        help="Cost of the sequential scans of the table in the plan of "
+             "the view, as estimated by EXPLAIN")
+    estimated_size = fields.Integer(
+        string='Estimated Size (kB)',
+        readonly=True,
+        help="Estimated size of the index")
+    state = fields.Selection(
+        [('suggested', 'Suggested'),
+         ('created', 'Created')],
+        default='suggested',
+        readonly=True)
+
+    @api.model
+    def _get_indexed_columns(self, tables):
+        """ Return the set of (table, column) that are the first column of
+            an index, among the columns of tables.
+        """
+        self.env.cr.execute("""
+            SELECT c.relname, a.attname
+              FROM pg_index i
+              JOIN pg_class c ON c.oid = i.indrelid
+              JOIN pg_attribute a
+                ON a.attrelid = c.oid AND a.attnum = i.indkey[0]
+             WHERE c.relname IN %s
+               AND pg_table_is_visible(c.oid)""", (tuple(tables),))
+        return set(self.env.cr.fetchall())
+
+    @api.model
+    def _get_column_stats(self, tables):
+        """ Return the estimated number of rows of tables, as
+            {table: rows}, and the average width of their columns, as
+            {(table, column): width}.
+        """
+        self.env.cr.execute("""
+            SELECT relname, reltuples
+              FROM pg_class
+             WHERE relname IN %s
+               AND relkind = 'r'
+               AND pg_table_is_visible(oid)""", (tuple(tables),))
+        rows = dict(self.env.cr.fetchall())
+        self.env.cr.execute("""
+            SELECT tablename, attname, avg_width
+              FROM pg_stats
+             WHERE tablename IN %s
+               AND schemaname = ANY(current_schemas(false))""",
+                            (tuple(tables),))
+        widths = {(t, c): w for t, c, w in self.env.cr.fetchall()}
+        return rows, widths
+
+    @api.model
+    def _get_seq_scan_costs(self, plan):
+        """ Return the total cost of the sequential scans of each table in
+            the EXPLAIN plan, as {table: cost}.
+        """
+        costs = {}
+        nodes = [plan]
+        while nodes:
+            node = nodes.pop()
+            if node.get('Node Type') == 'Seq Scan':
+                table = node.get('Relation Name')
+                costs[table] = costs.get(table, 0.0) + node['Total Cost']
+            nodes += node.get('Plans', [])
+        return costs
+
+    @api.model
+    def _prepare_suggestions(self, candidates, plan):
+        """ Return the values of the suggestions for the candidates
+            {(table, column): reason} that are not indexed yet.
+        """
+        tables = set(table for table, _column in candidates)
+        if not tables:
+            return []
+        indexed = self._get_indexed_columns(tables)
+        rows, widths = self._get_column_stats(tables)
+        scan_costs = self._get_seq_scan_costs(plan)
+        suggestions = []
+        for (table, column), reason in sorted(candidates.items()):
+            if (table, column) in indexed:
+                continue
+            table_rows = max(rows.get(table, 0.0), 0.0)
+            suggestions.append({
+                'table_name': table,
+                'column_name': column,
+                'reason': reason,
+                'estimated_rows': table_rows,
+                'scan_cost': scan_costs.get(table, 0.0),
+                'estimated_size': _estimate_index_size(
+                    table_rows, widths.get((table, column), 4)),
+            })
+        return suggestions
+
+    @api.multi
+    def action_create_index(self):
+        if not self.user_has_groups('base.group_system'):
+            raise AccessError(_('Only administrators can create indexes.'))
+        for index in self.filtered(lambda x: x.state == 'suggested'):
+            if not sql.column_exists(
+                    self.env.cr, index.table_name, index.column_name):
+                raise UserError(_('The column %s of the table %s does not '
+                                  'exist anymore.') % (
+                    index.column_name, index.table_name))
+            # IF NOT EXISTS needs PostgreSQL 9.5
+            self.env.cr.execute(
+                "SELECT 1 FROM pg_indexes WHERE indexname = %s",
+                (index.index_name,))
+            if not self.env.cr.fetchone():
+                # pylint: disable=sql-injection
+                self.env.cr.execute('CREATE INDEX "%s" ON "%s" ("%s")' % (
+                    index.index_name, index.table_name, index.column_name))
+            index.state = 'created'
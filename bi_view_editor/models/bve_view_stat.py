@@ -0,0 +1,149 @@
+# Copyright 2015-2018 Onestein (<http://www.onestein.eu>)
+# License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl).
+
+import logging
+from datetime import timedelta
+
+import psycopg2
+
+from odoo import api, fields, models
+from odoo.tools import sql
+
+_logger = logging.getLogger(__name__)
+
+# Number of days the snapshots of the statistics are kept
+STAT_RETENTION_DAYS = 90
+
+# Columns of the statistics, as read from pg_stat_statements and stored on
+# the snapshots
+STAT_COLUMNS = [
+    'calls', 'mean_time', 'max_time', 'rows',
+    'shared_blks_hit', 'shared_blks_read',
+]
+
+
+class BveViewStat(models.Model):
+    _name = 'bve.view.stat'
+    _description = 'BI View Editor Query Statistics'
+    _order = 'date desc, bve_view_id'
+
+    # the counters of pg_stat_statements are cumulative, so the latest
+    # snapshot of a period is the relevant one when they are grouped
+
+    bve_view_id = fields.Many2one(
+        'bve.view',
+        string='BI View',
+        required=True,
+        ondelete='cascade',
+        readonly=True)
+    date = fields.Datetime(
+        required=True,
+        readonly=True,
+        default=fields.Datetime.now)
+    calls = fields.Float(
+        digits=(16, 0),
+        readonly=True,
+        group_operator='max')
+    mean_time = fields.Float(
+        string='Mean Time (ms)',
+        digits=(16, 3),
+        readonly=True,
+        group_operator='avg')
+    max_time = fields.Float(
+        string='Max Time (ms)',
+        digits=(16, 3),
+        readonly=True,
+        group_operator='max')
+    rows = fields.Float(
+        digits=(16, 0),
+        readonly=True,
+        group_operator='max')
+    shared_blks_hit = fields.Float(
+        string='Shared Blocks Hit',
+        digits=(16, 0),
+        readonly=True,
+        group_operator='max')
+    shared_blks_read = fields.Float(
+        string='Shared Blocks Read',
+        digits=(16, 0),
+        readonly=True,
+        group_operator='max')
+
+    @api.model
+    def _read_query_stats(self, table_names):
+        """ Return the statistics of the statements of the current database
+            reading the views table_names, as {table name: {column: value}},
+            or None if pg_stat_statements is not available.
+
+            The counters are cumulative since the last reset of the
+            statistics of PostgreSQL.
+        """
+        cr = self.env.cr
+        cr.execute("""SELECT 1 FROM pg_extension
+            WHERE extname = 'pg_stat_statements'""")
+        if not cr.fetchone():
+            return None
+        if not table_names:
+            return {}
+        # the timing columns are renamed since PostgreSQL 13
+        if sql.column_exists(cr, 'pg_stat_statements', 'total_exec_time'):
+            total_time, max_time = 'total_exec_time', 'max_exec_time'
+        else:
+            total_time, max_time = 'total_time', 'max_time'
+        # the name of the view is matched as a whole word, and the
+        # statements creating or refreshing the views are left out
+        query = r"""
+            SELECT v.name,
+                   sum(s.calls),
+                   sum(s.{total_time}) / nullif(sum(s.calls), 0),
+                   max(s.{max_time}),
+                   sum(s.rows),
+                   sum(s.shared_blks_hit),
+                   sum(s.shared_blks_read)
+              FROM pg_stat_statements s
+              JOIN unnest(%s) AS v(name)
+                ON s.query ~ ('\m' || v.name || '\M')
+             WHERE s.dbid = (SELECT oid FROM pg_database
+                              WHERE datname = current_database())
+               AND s.query !~* '^\s*(create|drop|refresh|explain|analyze)'
+             GROUP BY v.name""".format(total_time=total_time,
+                                       max_time=max_time)
+        try:
+            # the extension may be created without being loaded by
+            # shared_preload_libraries, then reading it fails
+            with cr.savepoint():
+                cr.execute(query, (list(table_names),))
+                rows = cr.fetchall()
+        except psycopg2.Error as e:
+            _logger.warning(
+                "Statistics of the BI views not available: %s", e)
+            return None
+        return {
+            row[0]: dict(zip(STAT_COLUMNS, [x or 0 for x in row[1:]]))
+            for row in rows
+        }
+
+    @api.model
+    def _cron_snapshot(self):
+        """ Store the current statistics of the created BI views, and
+            remove the snapshots older than STAT_RETENTION_DAYS.
+        """
+        bve_views = self.env['bve.view'].search([('state', '=', 'created')])
+        tables = {
+            bve_view.model_name.replace('.', '_'): bve_view
+            for bve_view in bve_views
+        }
+        stats = self._read_query_stats(list(tables))
+        if stats is None:
+            return self.browse()
+        snapshots = self.browse()
+        for table_name, bve_view in tables.items():
+            vals = stats.get(table_name, dict.fromkeys(STAT_COLUMNS, 0))
+            vals['bve_view_id'] = bve_view.id
+            snapshots |= self.create(vals)
+        limit = fields.Datetime.from_string(fields.Datetime.now()) - \
+            timedelta(days=STAT_RETENTION_DAYS)
+        self.search([
+            ('date', '<', fields.Datetime.to_string(limit)),
+        ]).unlink()
+        return snapshots
@@ -1,7 +1,7 @@
 # Copyright 2015-2018 Onestein (<http://www.onestein.eu>)
 # License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl).
 
-from odoo import api, models, registry
+from odoo import SUPERUSER_ID, api, models, registry, tools
 
 NO_BI_MODELS = [
     'temp.range',
@@ -17,6 +17,13 @@ NO_BI_FIELDS = [
     'write_date'
 ]
 
+# Default size of the pages returned to the sidebar of the editor
+SEARCH_LIMIT = 80
+
+# Maximum number of partial paths explored at each level of the search
+# of the join paths between two models
+MAX_JOIN_PATH_CANDIDATES = 5000
+
 NO_BI_TTYPES = [
     'many2many',
     'one2many',
@@ -40,6 +47,18 @@ def dict_for_field(field):
     }
 
 
+def _get_search_rank(query, values):
+    """ Return the relevance of a record for a search: 0 if one of its
+        values equals query, 1 if one of them starts with it, 2 otherwise.
+    """
+    values = [value.lower() for value in values if value]
+    if query in values:
+        return 0
+    if any(value.startswith(query) for value in values):
+        return 1
+    return 2
+
+
 def dict_for_model(model):
     return {
         'id': model.id,
@@ -86,10 +105,42 @@ class IrModel(models.Model):
         count_check += _check_contains(model_model)
         count_check += _check_unknow(model_name)
         if not count_check:
-            return self.env['ir.model.access'].check(
-                model['model'], 'read', False)
+            return model_model in self._get_readable_models()
         return False
 
+    @api.model
+    @tools.ormcache('self._uid')
+    def _get_readable_models(self):
+        """ Return the set of the models the current user can read,
+            evaluating all the access rules in a single query, with the
+            logic of ir.model.access.check(): a model is readable if a rule
+            of a group of the user grants it, or else if a global rule
+            grants it, and transient models are always readable.
+            The result is cached per user in the registry, and cleared
+            when access rules or groups of users change.
+        """
+        if self._uid == SUPERUSER_ID:
+            self.env.cr.execute("SELECT model FROM ir_model")
+        else:
+            self.env.cr.execute("""
+                SELECT m.model
+                FROM ir_model_access a
+                JOIN ir_model m ON (m.id = a.model_id)
+                LEFT JOIN res_groups_users_rel gu
+                    ON (gu.gid = a.group_id AND gu.uid = %s)
+                WHERE a.active IS TRUE
+                GROUP BY m.model
+                HAVING COALESCE(
+                    NULLIF(MAX(CASE WHEN gu.uid IS NOT NULL
+                        THEN CASE WHEN a.perm_read THEN 1 ELSE 0 END END), 0),
+                    MAX(CASE WHEN a.group_id IS NULL
+                        THEN CASE WHEN a.perm_read THEN 1 ELSE 0 END END)
+                ) = 1
+                UNION
+                SELECT model FROM ir_model WHERE transient IS TRUE
+            """, (self._uid,))
+        return frozenset(row[0] for row in self.env.cr.fetchall())
+
     @api.model
     def sort_filter_models(self, models_list):
         res = sorted(
@@ -103,84 +154,107 @@ class IrModel(models.Model):
         fields = Fields.sudo().search(domain)
         return fields
 
+    @api.model
+    @tools.ormcache()
+    def _get_relation_graph(self):
+        """ Return the adjacency index of all the stored many2one fields,
+            as a dict with the keys:
+            - 'models': {model_id: model}
+            - 'model_ids': {model: model_id}
+            - 'transient': set of the ids of the transient models
+            - 'field_names': {field_id: name}
+            - 'outgoing': {model_id: [(field_id, relation), ...]}
+              for the many2one fields of each model;
+            - 'incoming': {relation: [(field_id, model_id), ...]}
+              for the many2one fields pointing to each model.
+            The index is cached in the registry, and cleared when
+            a model or a field is created, modified or deleted.
+        """
+        graph = {
+            'models': {},
+            'model_ids': {},
+            'transient': set(),
+            'field_names': {},
+            'outgoing': {},
+            'incoming': {},
+        }
+        self.env.cr.execute("SELECT id, model, transient FROM ir_model")
+        for model_id, model, transient in self.env.cr.fetchall():
+            graph['models'][model_id] = model
+            graph['model_ids'][model] = model_id
+            if transient:
+                graph['transient'].add(model_id)
+        self.env.cr.execute("""
+            SELECT id, name, model_id, relation
+            FROM ir_model_fields
+            WHERE ttype = 'many2one' AND store = true
+            ORDER BY name, id""")
+        for field_id, name, model_id, relation in self.env.cr.fetchall():
+            graph['field_names'][field_id] = name
+            graph['outgoing'].setdefault(model_id, []).append(
+                (field_id, relation))
+            graph['incoming'].setdefault(relation, []).append(
+                (field_id, model_id))
+        return graph
+
+    @api.model
+    def _get_related_fields(self, model_ids, related_model_id=None):
+        """ Return list of field dicts for all fields that can be
+            joined with models in model_ids, using the relation graph.
+            If related_model_id is set, only the fields linking the models
+            in model_ids with this model are returned.
+        """
+        graph = self._get_relation_graph()
+        related_model = graph['models'].get(related_model_id)
+        model_list = []
+        relation_list = []
+        for alias, model_id in model_ids.items():
+            model = graph['models'].get(model_id)
+            for field_id, field_model_id in graph['incoming'].get(model, []):
+                if related_model_id and field_model_id != related_model_id:
+                    continue
+                relation_list.append((field_id, {
+                    'join_node': alias,
+                    'table_alias': -1,
+                }))
+            for field_id, relation in graph['outgoing'].get(model_id, []):
+                if related_model_id and relation != related_model:
+                    continue
+                model_list.append((field_id, {
+                    'join_node': -1,
+                    'table_alias': alias,
+                }))
+        items = relation_list + model_list
+        fields = self.env['ir.model.fields'].sudo().browse(
+            list(set(item[0] for item in items)))
+        fields_by_id = {field.id: field for field in fields}
+        return [
+            dict(dict_for_field(fields_by_id[field_id]), **nodes)
+            for field_id, nodes in items]
+
     @api.model
     def get_related_fields(self, model_ids):
         """ Return list of field dicts for all fields that can be
             joined with models in model_ids
         """
-
-        def get_model_list(model_ids):
-            model_list = []
-            domain = [('model_id', 'in', list(model_ids.values())),
-                      ('store', '=', True),
-                      ('ttype', 'in', ['many2one'])]
-            filtered_fields = self._search_fields(domain)
-            for model in model_ids.items():
-                for field in filtered_fields:
-                    if model[1] == field.model_id.id:
-                        model_list.append(
-                            dict(dict_for_field(field),
-                                 join_node=-1,
-                                 table_alias=model[0])
-                        )
-            return model_list
-
-        def get_relation_list(model_ids, model_names):
-            relation_list = []
-            domain = [('relation', 'in', list(model_names.values())),
-                      ('store', '=', True),
-                      ('ttype', 'in', ['many2one'])]
-            filtered_fields = self._search_fields(domain)
-            for model in model_ids.items():
-                for field in filtered_fields:
-                    if model_names[model[1]] == field['relation']:
-                        relation_list.append(
-                            dict(dict_for_field(field),
-                                 join_node=model[0],
-                                 table_alias=-1)
-                        )
-            return relation_list
-
-        models = self.sudo().browse(model_ids.values())
-        model_names = {}
-        for model in models:
-            model_names.update({model.id: model.model})
-
-        model_list = get_model_list(model_ids)
-        relation_list = get_relation_list(model_ids, model_names)
-
-        return relation_list + model_list
+        return self._get_related_fields(model_ids)
 
     @api.model
     def get_related_models(self, model_ids):
         """ Return list of model dicts for all models that can be
             joined with the already selected models.
         """
-
-        def _get_field(fields, orig, target):
-            field_list = []
-            for f in fields:
-                if f[orig] == -1:
-                    field_list.append(f[target])
-            return field_list
-
-        def _get_list_id(model_ids, fields):
-            list_model = list(model_ids.values())
-            list_model += _get_field(fields, 'table_alias', 'model_id')
-            return list_model
-
-        def _get_list_relation(fields):
-            list_model = _get_field(fields, 'join_node', 'relation')
-            return list_model
-
+        graph = self._get_relation_graph()
+        list_id = set(model_ids.values())
+        for model_id in model_ids.values():
+            model = graph['models'].get(model_id)
+            for _field_id, field_model_id in graph['incoming'].get(model, []):
+                list_id.add(field_model_id)
+            for _field_id, relation in graph['outgoing'].get(model_id, []):
+                if relation in graph['model_ids']:
+                    list_id.add(graph['model_ids'][relation])
         models_list = []
-        related_fields = self.get_related_fields(model_ids)
-        list_id = _get_list_id(model_ids, related_fields)
-        list_model = _get_list_relation(related_fields)
-        domain = ['|',
-                  ('id', 'in', list_id),
-                  ('model', 'in', list_model)]
-        for model in self.sudo().search(domain):
+        for model in self.sudo().browse(list(list_id)).exists():
             models_list.append(dict_for_model(model))
         return self.sort_filter_models(models_list)
 
@@ -190,7 +264,9 @@ class IrModel(models.Model):
         """
 
         models_list = []
-        for model in self.search([('transient', '=', False)]):
+        for model in self.search([
+                ('transient', '=', False),
+                ('model', 'in', list(self._get_readable_models()))]):
             models_list.append(dict_for_model(model))
         return self.sort_filter_models(models_list)
 
@@ -211,12 +287,8 @@ class IrModel(models.Model):
             for alias, model_id in model_ids.items():
                 if model_id == new_field['model_id']:
                     join_nodes.append({'table_alias': alias})
-            for field in self.get_related_fields(model_ids):
-                c = [field['join_node'] == -1, field['table_alias'] == -1]
-                a = (new_field['model'] == field['relation'])
-                b = (new_field['model_id'] == field['model_id'])
-                if (a and c[0]) or (b and c[1]):
-                    join_nodes.append(field)
+            join_nodes += self._get_related_fields(
+                model_ids, related_model_id=new_field['model_id'])
             return join_nodes
 
         def remove_duplicate_nodes(join_nodes):
@@ -240,13 +312,135 @@ class IrModel(models.Model):
                       (x['table_alias'], x['id']) not in keys, join_nodes))
 
     @api.model
-    def get_fields(self, model_id):
+    def _get_join_path_neighbours(self, graph, model_id):
+        """ Return the list of (field_id, direction, model_id) of the
+            models that can be joined with model_id to build a join path:
+            - 'out': by a many2one field of model_id;
+            - 'in': by a many2one field of the other model.
+            Magic fields and transient models are ignored.
+        """
+        def _is_valid(field_id, other_model_id):
+            return other_model_id and \
+                other_model_id not in graph['transient'] and \
+                graph['field_names'][field_id] not in NO_BI_FIELDS
+
+        neighbours = []
+        for field_id, relation in graph['outgoing'].get(model_id, []):
+            other_model_id = graph['model_ids'].get(relation)
+            if _is_valid(field_id, other_model_id):
+                neighbours.append((field_id, 'out', other_model_id))
+        model = graph['models'].get(model_id)
+        for field_id, other_model_id in graph['incoming'].get(model, []):
+            if _is_valid(field_id, other_model_id):
+                neighbours.append((field_id, 'in', other_model_id))
+        return neighbours
+
+    @api.model
+    def _get_estimated_rows(self, model_ids):
+        """ Return a dict {model_id: estimated number of rows}, based on
+            the statistics of the tables of the models.
+        """
+        graph = self._get_relation_graph()
+        tables = {}
+        for model_id in model_ids:
+            model = graph['models'].get(model_id)
+            if model in self.env:
+                tables[self.env[model]._table] = model_id
+        res = dict.fromkeys(model_ids, 0.0)
+        if not tables:
+            return res
+        q = """
+            SELECT relname, reltuples
+            FROM pg_class
+            WHERE relname IN %s AND relkind IN ('r', 'v', 'm')"""
+        self.env.cr.execute(q, (tuple(tables),))
+        for table, rows in self.env.cr.fetchall():
+            res[tables[table]] = max(rows, 0.0)
+        return res
+
+    @api.model
+    def get_join_paths(self, field_data, new_field, limit=5, max_length=4):
+        """ Return list of the shortest join paths between the models
+            of field_data and the model of new_field.
+
+            Paths are searched on the relation graph, and ranked by length
+            and by estimated cardinality: following a many2one field keeps
+            the number of rows, while following it backward multiplies it by
+            the average number of records pointing to a same record.
+            Each path is a dict with the keys 'table_alias' (the alias the
+            path starts from), 'length', 'cardinality' and 'steps', the list
+            of field dicts to join, with their 'direction' ('out' or 'in').
+        """
+        graph = self._get_relation_graph()
+        target_id = new_field['model_id']
+        model_ids = dict([(field['table_alias'],
+                           field['model_id']) for field in field_data])
+
+        # breadth first search of the simple paths, level by level
+        found = []
+        frontier = [
+            (alias, [model_id], [])
+            for alias, model_id in sorted(model_ids.items())]
+        for _length in range(max_length):
+            next_frontier = []
+            for alias, visited, steps in frontier:
+                neighbours = self._get_join_path_neighbours(
+                    graph, visited[-1])
+                for field_id, direction, model_id in neighbours:
+                    if model_id in visited:
+                        continue
+                    path = (alias, visited + [model_id],
+                            steps + [(field_id, direction)])
+                    if model_id == target_id:
+                        found.append(path)
+                    else:
+                        next_frontier.append(path)
+            if len(found) >= limit or not next_frontier:
+                break
+            frontier = next_frontier[:MAX_JOIN_PATH_CANDIDATES]
+
+        if not found:
+            return []
+
+        estimated_rows = self._get_estimated_rows(
+            set(model_id for path in found for model_id in path[1]))
+        paths = []
+        for alias, visited, steps in found:
+            cardinality = estimated_rows[visited[0]]
+            for i, (_field_id, direction) in enumerate(steps):
+                if direction == 'in':
+                    cardinality *= estimated_rows[visited[i + 1]] / max(
+                        estimated_rows[visited[i]], 1.0)
+            paths.append((len(steps), cardinality, alias, steps))
+        paths = sorted(paths, key=lambda x: (x[0], x[1]))[:limit]
+
+        fields = self.env['ir.model.fields'].sudo().browse(list(set(
+            field_id for path in paths for field_id, _direction in path[3])))
+        fields_by_id = {field.id: field for field in fields}
+        return [{
+            'table_alias': alias,
+            'length': length,
+            'cardinality': int(cardinality),
+            'steps': [
+                dict(dict_for_field(fields_by_id[field_id]),
+                     direction=direction)
+                for field_id, direction in steps],
+        } for length, cardinality, alias, steps in paths]
+
+    @api.model
+    def _get_bi_fields(self, model_id, query=''):
         domain = [
             ('model_id', '=', model_id),
             ('store', '=', True),
             ('name', 'not in', NO_BI_FIELDS),
             ('ttype', 'not in', NO_BI_TTYPES)
         ]
+        if query:
+            domain += [
+                '|',
+                ('name', 'ilike', query),
+                ('field_description', 'ilike', query)
+            ]
         fields_dict = []
         filtered_fields = self._search_fields(domain)
         for field in filtered_fields:
@@ -261,13 +455,64 @@ class IrModel(models.Model):
                  'model_name': field.model_id.name
                  }
             )
+        return fields_dict
+
+    @api.model
+    def get_fields(self, model_id):
         sorted_fields = sorted(
-            fields_dict,
+            self._get_bi_fields(model_id),
             key=lambda x: x['description'],
             reverse=True
         )
         return sorted_fields
 
+    @api.model
+    def search_bi_models(self, query='', model_ids=None,
+                         limit=SEARCH_LIMIT, offset=0):
+        """ Return a page of the available models matching query
+
+            Models are matched on their name and technical name, the exact
+            and prefix matches first. If model_ids is set, only the models
+            related to them are searched. Return a dict with the page of
+            model dicts in 'models' and the number of matches in 'length'.
+        """
+        if model_ids:
+            models_list = self.get_related_models(model_ids)
+        else:
+            models_list = self.get_models()
+        query = (query or '').strip().lower()
+        if query:
+            models_list = sorted([
+                model for model in models_list
+                if query in model['name'].lower() or
+                query in model['model'].lower()
+            ], key=lambda x: _get_search_rank(
+                query, [x['name'], x['model']]))
+        return {
+            'models': models_list[offset:offset + limit],
+            'length': len(models_list),
+        }
+
+    @api.model
+    def search_bi_fields(self, model_id, query='',
+                         limit=SEARCH_LIMIT, offset=0):
+        """ Return a page of the fields of model_id matching query
+
+            Fields are matched on their name and description, the exact
+            and prefix matches first. Return a dict with the page of field
+            dicts in 'fields' and the number of matches in 'length'.
+        """
+        query = (query or '').strip().lower()
+        fields_list = sorted(
+            self._get_bi_fields(model_id, query),
+            key=lambda x: (
+                _get_search_rank(query, [x['name'], x['description']]),
+                x['description'].lower()))
+        return {
+            'fields': fields_list[offset:offset + limit],
+            'length': len(fields_list),
+        }
+
     @api.model
     def create(self, vals):
         if self.env.context and self.env.context.get('bve'):
@@ -280,8 +525,12 @@ class IrModel(models.Model):
         q = "UPDATE ir_model SET state = 'manual' WHERE id = %s"
         self.env.cr.execute(q, (res.id, ))
 
-        # # update registry
-        if self.env.context.get('bve'):
+        # clear the relation graph of the BI View Editor
+        self.clear_caches()
+
+        # # update registry, unless a batch of BI views does it at the end
+        if self.env.context.get('bve') and \
+                not self.env.context.get('bve_defer_setup'):
             # setup models; this reloads custom models in registry
             self.pool.setup_models(self._cr)
 
@@ -289,3 +538,10 @@ class IrModel(models.Model):
             registry(self.env.cr.dbname).signal_changes()
 
         return res
+
+    @api.multi
+    def unlink(self):
+        res = super(IrModel, self).unlink()
+        # clear the relation graph of the BI View Editor
+        self.clear_caches()
+        return res
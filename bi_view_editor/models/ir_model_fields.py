@@ -0,0 +1,36 @@
+# Copyright 2015-2018 Onestein (<http://www.onestein.eu>)
+# License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl).
+
+from odoo import api, models
+
+# Changes of these values alter the relation graph of the BI View Editor
+RELATION_GRAPH_FIELDS = [
+    'model_id',
+    'name',
+    'relation',
+    'store',
+    'ttype',
+]
+
+
+class IrModelFields(models.Model):
+    _inherit = 'ir.model.fields'
+
+    @api.model
+    def create(self, vals):
+        res = super(IrModelFields, self).create(vals)
+        self.clear_caches()
+        return res
+
+    @api.multi
+    def write(self, vals):
+        res = super(IrModelFields, self).write(vals)
+        if any(key in vals for key in RELATION_GRAPH_FIELDS):
+            self.clear_caches()
+        return res
+
+    @api.multi
+    def unlink(self):
+        res = super(IrModelFields, self).unlink()
+        self.clear_caches()
+        return res
@@ -1,13 +1,42 @@
 # Copyright 2017-2018 Onestein (<http://www.onestein.eu>)
 # License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl).
 
+import copy
 import logging
+import threading
+import time
+from collections import OrderedDict
 
 from odoo import _, api, models
 from odoo.exceptions import UserError
 
 _logger = logging.getLogger(__name__)
 
+# Maximum number of read_group results of the BI views kept in memory by
+# each worker, the least recently used are evicted first
+READ_GROUP_CACHE_SIZE = 512
+
+# Number of seconds the cache duration of a BI view is kept in memory,
+# after which it is read again to see the changes made by other workers
+CACHE_TTL_REFRESH = 60
+
+# read_group results of the BI views: {key: (expiration time, result)}
+_read_group_cache = OrderedDict()
+# cache durations of the BI views: {(dbname, model): (expiration time, ttl)}
+_cache_ttls = {}
+_read_group_cache_lock = threading.Lock()
+
+
+def clear_read_group_cache(dbname, model_name=None):
+    """ Remove the cached read_group results and cache duration of the BI
+        view model_name, or of all the BI views of the database dbname.
+    """
+    with _read_group_cache_lock:
+        for cache in (_read_group_cache, _cache_ttls):
+            for key in list(cache):
+                if key[0] == dbname and model_name in (None, key[1]):
+                    del cache[key]
+
 
 @api.model
 def _bi_view(_name):
@@ -44,6 +73,12 @@ class Base(models.AbstractModel):
             super(Base, self)._setup_complete()
         else:
             self.pool.models[self._name]._log_access = False
+            if 'bve.view' in self.env:
+                operators = self.env['bve.view']._get_group_operators(
+                    self._name)
+                for name, operator in operators.items():
+                    if name in self._fields:
+                        self._fields[name].group_operator = operator
 
     @api.model
     def _read_group_process_groupby(self, gb, query):
@@ -56,6 +91,56 @@ class Base(models.AbstractModel):
                 _('No data to be displayed.'))
         return super(Base, self)._read_group_process_groupby(gb, query)
 
+    @api.model
+    def _get_read_group_cache_ttl(self):
+        key = (self.env.cr.dbname, self._name)
+        now = time.time()
+        with _read_group_cache_lock:
+            entry = _cache_ttls.get(key)
+        if entry and entry[0] > now:
+            return entry[1]
+        ttl = self.env['bve.view'].sudo()._get_cache_ttl(self._name)
+        with _read_group_cache_lock:
+            _cache_ttls[key] = (now + CACHE_TTL_REFRESH, ttl)
+        return ttl
+
+    @api.model
+    def read_group(self, domain, fields, groupby, offset=0, limit=None,
+                   orderby=False, lazy=True):
+        ttl = 0
+        if _bi_view(self._name) and 'bve.view' in self.env:
+            ttl = self._get_read_group_cache_ttl()
+        if not ttl:
+            return super(Base, self).read_group(
+                domain, fields, groupby, offset=offset, limit=limit,
+                orderby=orderby, lazy=lazy)
+
+        # the result depends on the record rules of the user, and on the
+        # language and timezone for the labels of the groups
+        self.check_access_rights('read')
+        rule_domain = self.env['ir.rule']._compute_domain(self._name, 'read')
+        key = (
+            self.env.cr.dbname, self._name, repr(domain), repr(fields),
+            repr(groupby), offset, limit, orderby, lazy, repr(rule_domain),
+            self.env.context.get('lang'), self.env.context.get('tz'),
+        )
+        now = time.time()
+        with _read_group_cache_lock:
+            entry = _read_group_cache.get(key)
+            if entry and entry[0] > now:
+                _read_group_cache.move_to_end(key)
+                return copy.deepcopy(entry[1])
+
+        result = super(Base, self).read_group(
+            domain, fields, groupby, offset=offset, limit=limit,
+            orderby=orderby, lazy=lazy)
+        with _read_group_cache_lock:
+            _read_group_cache[key] = (now + ttl, copy.deepcopy(result))
+            _read_group_cache.move_to_end(key)
+            while len(_read_group_cache) > READ_GROUP_CACHE_SIZE:
+                _read_group_cache.popitem(last=False)
+        return result
+
     @api.model
     def _add_magic_fields(self):
         if _bi_view(self._name):
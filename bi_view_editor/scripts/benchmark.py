@@ -0,0 +1,221 @@
+# Copyright 2015-2018 Onestein (<http://www.onestein.eu>)
+# License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl).
+"""Benchmark of the server endpoints of the BI View Editor.
+
+Generate a synthetic registry of the requested number of models, each with
+many2one fields to the models generated before it, then time the endpoints
+used by the editor (get_models, get_fields, get_related_models,
+get_join_nodes) and the generation of a BI view joining two of them
+(action_create, action_reset). One JSON object is printed per measured
+endpoint, with the median and 95th percentile of the duration and of the
+number of SQL queries per call, so that results of several versions can be
+compared.
+
+The caches of the relation graph are cleared before each call, unless
+--warm is set. Everything is done in a single transaction, rolled back at
+the end, unless --commit is set. Sample:
+
+    python bi_view_editor/scripts/benchmark.py -c odoo.cfg -d bench \\
+        --models 100 --models 1000 --fields 5 > results.jsonl
+"""
+
+import argparse
+import json
+import sys
+import time
+
+import odoo
+from odoo import SUPERUSER_ID, api
+
+SYNTHETIC_MODEL = 'x_bench_bve_%d'
+
+
+def _percentile(values, percent):
+    """ Return the nearest-rank percentile of values """
+    values = sorted(values)
+    rank = max(int(round(percent / 100.0 * len(values))) - 1, 0)
+    return values[rank]
+
+
+def create_synthetic_models(env, models, fields):
+    """ Create the given number of manual models, each with a name field
+        and up to the given number of many2one fields to the models created
+        before it, and return them.
+
+        The registry is set up once, after all the models are created, and
+        the other workers are not signaled, since the transaction is rolled
+        back in the end.
+    """
+    IrModel = env['ir.model'].with_context(bve=True, bve_defer_setup=True)
+    ir_models = IrModel.browse()
+    for index in range(models):
+        field_vals = [(0, 0, {
+            'name': 'x_name',
+            'field_description': 'Name',
+            'ttype': 'char',
+            'state': 'manual',
+        })]
+        for link in range(min(fields, index)):
+            field_vals.append((0, 0, {
+                'name': 'x_link_%d' % link,
+                'field_description': 'Link %d' % link,
+                'ttype': 'many2one',
+                'relation': SYNTHETIC_MODEL % (index - link - 1),
+                'state': 'manual',
+            }))
+        ir_models |= IrModel.create({
+            'name': 'Benchmark %d' % index,
+            'model': SYNTHETIC_MODEL % index,
+            'state': 'manual',
+            'field_id': field_vals,
+        })
+    env.registry.setup_models(env.cr)
+    env.registry.init_models(
+        env.cr, ir_models.mapped('model'),
+        dict(env.context, update_custom_fields=True))
+    return ir_models
+
+
+def _field_data(env, ir_model, name, alias, **values):
+    """ Return the entry of the data of a BI view for the field name of
+        ir_model, read at the table alias.
+    """
+    field = env['ir.model.fields'].search([
+        ('model_id', '=', ir_model.id), ('name', '=', name)])
+    data = {
+        'model_id': ir_model.id,
+        'name': name,
+        'model_name': ir_model.name,
+        'model': ir_model.model,
+        'custom': 0,
+        'type': field.ttype,
+        'id': field.id,
+        'description': field.field_description,
+        'table_alias': alias,
+        'row': 0,
+        'column': 0,
+        'list': 1,
+        'measure': 0,
+    }
+    data.update(values)
+    return data
+
+
+def _measure(env, step, models, fields, repeat, func, warm=False,
+             setup=None):
+    cr = env.cr
+    durations = []
+    queries = []
+    for _index in range(repeat):
+        if setup:
+            setup()
+        if not warm:
+            env['ir.model'].clear_caches()
+        query_count = cr.sql_log_count
+        start = time.time()
+        func()
+        durations.append(time.time() - start)
+        queries.append(cr.sql_log_count - query_count)
+    result = {
+        'module': 'bi_view_editor',
+        'version': env.ref('base.module_bi_view_editor').latest_version,
+        'step': step,
+        'models': models,
+        'fields': fields,
+        'calls': repeat,
+        'p50': round(_percentile(durations, 50), 6),
+        'p95': round(_percentile(durations, 95), 6),
+        'queries_p50': _percentile(queries, 50),
+        'queries_p95': _percentile(queries, 95),
+    }
+    print(json.dumps(result, sort_keys=True))
+    sys.stdout.flush()
+    return result
+
+
+def benchmark(env, models, fields, repeat, warm=False):
+    """ Measure the endpoints on models synthetic models with fields
+        many2one fields each, and return the results.
+    """
+    models, fields = max(models, 2), max(fields, 1)
+    ir_models = create_synthetic_models(env, models, fields)
+    IrModel = env['ir.model']
+    first, last = ir_models[0], ir_models[-1]
+    field_data = [
+        _field_data(env, last, 'x_name', 't0', row=1),
+        _field_data(
+            env, last, 'x_link_0', 't0',
+            relation=ir_models[-2].model, join_node='t1'),
+    ]
+    new_field = _field_data(env, first, 'x_name', 't2')
+    results = []
+
+    def measure(step, func, repeat=repeat, setup=None):
+        results.append(_measure(
+            env, step, models, fields, repeat, func, warm=warm,
+            setup=setup))
+
+    measure('get_models', IrModel.get_models)
+    measure('get_fields', lambda: IrModel.get_fields(last.id))
+    measure('get_related_models', lambda: IrModel.get_related_models(
+        {'t0': last.id, 't1': ir_models[-2].id}))
+    measure('get_join_nodes', lambda: IrModel.get_join_nodes(
+        field_data, new_field))
+
+    bve_view = env['bve.view'].create({
+        'name': 'Benchmark %d %d' % (models, fields),
+        'data': json.dumps(field_data + [
+            _field_data(env, ir_models[-2], 'x_name', 't1', column=1)]),
+    })
+    # each generation reloads the registry: run it fewer times; the view
+    # is generated or reset before each call, out of the measure
+    cycles = max(repeat // 10, 1)
+    measure(
+        'action_create', bve_view.action_create, repeat=cycles,
+        setup=lambda: bve_view.state == 'created' and bve_view._reset())
+    measure(
+        'action_reset', bve_view.action_reset, repeat=cycles,
+        setup=lambda: bve_view.state == 'draft' and bve_view.action_create())
+    bve_view.unlink()
+    ir_models.unlink()
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('-c', '--config', help="Odoo configuration file")
+    parser.add_argument('-d', '--database', required=True)
+    parser.add_argument(
+        '--models', type=int, action='append',
+        help="Number of generated models. Can be repeated. Default: 100")
+    parser.add_argument(
+        '--fields', type=int, default=5,
+        help="Number of many2one fields of each generated model")
+    parser.add_argument(
+        '--repeat', type=int, default=20,
+        help="Number of calls of each endpoint")
+    parser.add_argument(
+        '--warm', action='store_true',
+        help="Keep the caches of the relation graph between the calls")
+    parser.add_argument(
+        '--commit', action='store_true',
+        help="Commit the transaction instead of rolling it back")
+    args = parser.parse_args(argv)
+
+    odoo_args = ['-d', args.database]
+    if args.config:
+        odoo_args += ['-c', args.config]
+    odoo.tools.config.parse_config(odoo_args)
+    registry = odoo.registry(args.database)
+    with api.Environment.manage(), registry.cursor() as cr:
+        env = api.Environment(cr, SUPERUSER_ID, {})
+        try:
+            for models in args.models or [100]:
+                benchmark(env, models, args.fields, args.repeat, args.warm)
+        finally:
+            if not args.commit:
+                cr.rollback()
+
+
+if __name__ == '__main__':
+    main()
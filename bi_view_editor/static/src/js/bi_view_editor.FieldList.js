@@ -26,33 +26,87 @@ odoo.define('bi_view_editor.FieldList', function (require) {
         }
     });
 
+    // Columns that can be derived from a field, see DERIVED_DATES and
+    // DERIVED_OPERATORS in bve_view.py
+    var DERIVED_DATES = {
+        day: 'Day',
+        week: 'Week',
+        month: 'Month',
+        quarter: 'Quarter',
+        year: 'Year',
+        year_number: 'Year (number)'
+    };
+    var DERIVED_OPERATORS = [
+        {name: 'add', label: '+'},
+        {name: 'subtract', label: '-'},
+        {name: 'multiply', label: '\u00d7'},
+        {name: 'divide', label: '\u00f7'}
+    ];
+
+    var isMeasureable = function (field) {
+        return field.type === "float" ||
+            field.type === "integer" ||
+            field.type === "monetary";
+    };
+
     var FieldListFieldContextMenu = FieldListContextMenu.extend({
         template: 'bi_view_editor.FieldList.FieldContextMenu',
-        open: function (x, y, field) {
+        open: function (x, y, field, operands) {
             this.$el.find('.checkbox-column').prop('checked', field.column);
             this.$el.find('.checkbox-row').prop('checked', field.row);
             this.$el.find('.checkbox-measure').prop('checked', field.measure);
             this.$el.find('.checkbox-list').prop('checked', field.list);
+            this.$el.find('.checkbox-index').prop('checked', field.index);
+            this.$el.find('.select-aggregate').val(field.aggregate || 'sum');
 
-            var measureable =
-                field.type === "float" ||
-                field.type === "integer" ||
-                field.type === "monetary"
-            ;
+            var measureable = isMeasureable(field);
+            var derivable_date = !field.derived &&
+                (field.type === "date" || field.type === "datetime");
+            var derivable_numeric = !field.derived && measureable &&
+                operands.length > 0;
 
             this.$el.find('.checkbox-column').attr('disabled', measureable);
             this.$el.find('.checkbox-row').attr('disabled', measureable);
             this.$el.find('.checkbox-measure').attr('disabled', !measureable);
             this.$el.find('.checkbox-list').attr('disabled', false);
+            this.$el.find('.checkbox-index').attr('disabled', false);
+            this.$el.find('.select-aggregate').attr('disabled', !field.measure);
+            this.$el.find('.derived-date').toggleClass('hidden', !derivable_date);
+            this.$el.find('.derived-numeric').toggleClass('hidden', !derivable_numeric);
+            this.$el.find('.select-derived-date').val('');
+            this.$el.find('.select-derived-numeric').html(qweb.render(
+                'bi_view_editor.FieldList.DerivedNumericOptions', {
+                    operands: operands,
+                    operators: DERIVED_OPERATORS
+                }));
 
             var events = this._super(x, y, field);
-            this.$el.find('input').unbind('change');
+            var $aggregate = this.$el.find('.select-aggregate');
+            this.$el.find('input, select').unbind('change');
             this.$el.find('input').change(function () {
                 var $checkbox = $(this);
                 var property = $checkbox.attr('data-for');
                 field[property] = $checkbox.is(':checked');
+                $aggregate.attr('disabled', !field.measure);
                 events.trigger('change', field);
             });
+            $aggregate.change(function () {
+                field.aggregate = $aggregate.val();
+                events.trigger('change', field);
+            });
+            this.$el.find('.select-derived-date').change(function () {
+                var derived = $(this).val();
+                if (derived) {
+                    events.trigger('derive', field, derived);
+                }
+            });
+            this.$el.find('.select-derived-numeric').change(function () {
+                var value = $(this).val().split(':');
+                if (value.length === 2) {
+                    var operand = _.findWhere(operands, {name: value[1]});
+                    events.trigger('derive', field, value[0], operand);
+                }
+            });
 
             return events;
         }
@@ -133,6 +187,7 @@ odoo.define('bi_view_editor.FieldList', function (require) {
             field.column = typeof field.column === 'undefined' ? false : field.column;
             field.measure = typeof field.measure === 'undefined' ? false : field.measure;
             field.list = typeof field.list === 'undefined' ? true : field.list;
+            field.index = typeof field.index === 'undefined' ? false : field.index;
             field._id = typeof field._id === 'undefined' ? _.uniqueId('node_') : field._id;
             if (field.join_node) {
                 field.join_left = typeof field.join_left === 'undefined' ? false : field.join_left;
@@ -188,16 +243,46 @@ odoo.define('bi_view_editor.FieldList', function (require) {
         openContextMenu: function ($item, x, y) {
             var field = $item.data('field');
             var contextmenu = field.join_node ? this.contextmenu_join : this.contextmenu;
-            // Temporary disable contextmenu for join node (until left join is implemented)
-            if (field.join_node) {
-                return;
-            }
-            contextmenu.open(x - 20, y - 20, $item.data('field')).on('change', function (f) {
+            var operands = _.filter(this.get(), function (f) {
+                return f._id !== field._id && !f.derived && !f.join_node &&
+                    isMeasureable(f);
+            });
+            contextmenu.open(x - 20, y - 20, $item.data('field'), operands).on('change', function (f) {
                 $item.data('field', f);
                 this.refreshItem($item);
                 this.trigger('updated');
+            }.bind(this)).on('derive', function (f, derived, operand) {
+                contextmenu.$el.addClass('hidden');
+                this.addDerived(f, derived, operand);
             }.bind(this));
         },
+        addDerived: function (field, derived, operand) {
+            var derived_field = _.extend(_.omit(field, '_id', 'index'), {
+                derived: derived,
+                name: field.name + '_' + derived,
+                row: false,
+                column: false,
+                measure: false,
+                list: true
+            });
+            if (operand) {
+                var operator = _.findWhere(DERIVED_OPERATORS, {name: derived});
+                _.extend(derived_field, {
+                    operand: operand.name,
+                    type: 'float',
+                    description: field.description + ' ' + operator.label +
+                        ' ' + operand.description
+                });
+            } else {
+                _.extend(derived_field, {
+                    type: derived === 'year_number' ? 'integer' : 'char',
+                    description: field.description + ' (' +
+                        DERIVED_DATES[derived] + ')'
+                });
+            }
+            this.add(derived_field);
+            this.trigger('updated');
+        },
         refreshItem: function ($item) {
             var data = $item.data('field');
             var $attributes = $item.find('span[data-for], img[data-for]');
@@ -20,7 +20,7 @@ odoo.define('bi_view_editor.JoinNodeDialog', function (require) {
             this.choices = choices;
             // Prepare data for view
             for (var i = 0; i < choices.length; i++) {
-                if (choices[i].join_node !== -1 && choices[i].table_alias !== -1) {
+                if (choices[i].steps || (choices[i].join_node !== -1 && choices[i].table_alias !== -1)) {
                     choices[i].model_name = model_data[choices[i].table_alias].model_name;
                 }
                 choices[i].index = i;
@@ -9,6 +9,13 @@ odoo.define('bi_view_editor.ModelList', function (require) {
     var session = require('web.session');
     var qweb = core.qweb;
 
+    // Number of records fetched per page, see SEARCH_LIMIT in ir_model.py
+    var SEARCH_LIMIT = 80;
+    // Delay of the search after the last key stroke, in milliseconds
+    var SEARCH_DELAY = 300;
+    // Number of models whose fields are kept in the cache
+    var FIELDS_CACHE_SIZE = 20;
+
     var ModelList = Widget.extend({
         template: 'bi_view_editor.ModelList',
         events: {
@@ -18,8 +25,14 @@ odoo.define('bi_view_editor.ModelList', function (require) {
             var res = this._super(parent);
             this.active_models = [];
             this.cache_fields = {};
+            this.cache_field_pages = {};
+            this.cache_fields_order = [];
+            this.search_sequence = 0;
             this.current_filter = '';
+            this.model_ids = null;
+            this.offset = 0;
             this.mode = null;
+            this.filterChanged = _.debounce(this.filterChanged, SEARCH_DELAY);
             return res;
         },
         setMode: function (mode) {
@@ -43,43 +56,105 @@ odoo.define('bi_view_editor.ModelList', function (require) {
             this.active_models.push(id);
         },
         loadModels: function (model_ids) {
-            if (model_ids) {
-                return this._rpc({
-                    model: 'ir.model',
-                    method: 'get_related_models',
-                    args: [model_ids],
-                    context: {
-                        lang: session.user_context.lang
-                    }
-                });
-            }
+            this.model_ids = model_ids;
+            this.offset = 0;
+            this.search_sequence++;
+            return this.searchModels();
+        },
+        searchModels: function () {
+            // The results of a search started before the last call of
+            // loadModels are dropped, so that they can not replace the
+            // results of the current query or models
+            var sequence = this.search_sequence;
+            var def = $.Deferred();
+            this._rpc({
+                model: 'ir.model',
+                method: 'search_bi_models',
+                kwargs: {
+                    query: this.current_filter,
+                    model_ids: this.model_ids,
+                    limit: SEARCH_LIMIT,
+                    offset: this.offset
+                },
+                context: {
+                    lang: session.user_context.lang
+                }
+            }).done(function (result) {
+                if (sequence === this.search_sequence) {
+                    def.resolve(result);
+                }
+            }.bind(this)).fail(def.reject.bind(def));
+            return def;
+        },
+        loadMoreModels: function () {
+            this.offset += SEARCH_LIMIT;
+            this.searchModels().done(function (result) {
+                this.populateModels(result);
+            }.bind(this));
+        },
+        searchFields: function (model_id, offset) {
             return this._rpc({
                 model: 'ir.model',
-                method: 'get_models',
+                method: 'search_bi_fields',
+                args: [model_id],
+                kwargs: {
+                    limit: SEARCH_LIMIT,
+                    offset: offset
+                },
                 context: {
                     lang: session.user_context.lang
                 }
             });
         },
         loadFields: function (model_id) {
+            var self = this;
             if (!(model_id in this.cache_fields)) {
-                var deferred = this._rpc({
-                    model: 'ir.model',
-                    method: 'get_fields',
-                    args: [model_id],
-                    context: {
-                        lang: session.user_context.lang
-                    }
-                });
-                this.cache_fields[model_id] = deferred;
+                this.cache_fields[model_id] = this.searchFields(model_id, 0);
+                this.cache_field_pages[model_id] = [];
+            }
+            // Keep the most recently used models at the end of the cache
+            this.cache_fields_order = _.without(
+                this.cache_fields_order, model_id);
+            this.cache_fields_order.push(model_id);
+            while (this.cache_fields_order.length > FIELDS_CACHE_SIZE) {
+                var evicted = this.cache_fields_order.shift();
+                delete this.cache_fields[evicted];
+                delete this.cache_field_pages[evicted];
             }
-            return this.cache_fields[model_id];
+            // The first page is completed with the pages loaded since
+            var pages = this.cache_field_pages[model_id];
+            return this.cache_fields[model_id].then(function (result) {
+                return {
+                    fields: result.fields.concat(_.flatten(pages, true)),
+                    length: result.length
+                };
+            }, function () {
+                delete self.cache_fields[model_id];
+                delete self.cache_field_pages[model_id];
+            });
+        },
+        loadMoreFields: function (model_id) {
+            var self = this;
+            var offset = this.$el.find(
+                ".class[data-id='" + model_id + "']").parent().find('.field').length;
+            this.searchFields(model_id, offset).done(function (more) {
+                var pages = self.cache_field_pages[model_id];
+                var cached = SEARCH_LIMIT + _.flatten(pages || [], true).length;
+                if (pages && cached === offset) {
+                    pages.push(more.fields);
+                }
+                self.populateFields(more, model_id);
+            });
         },
-        populateModels: function (models) {
+        populateModels: function (result) {
             var self = this;
-            this.$el.find(".class-list").html('');
+            var $class_list = this.$el.find(".class-list");
+            if (this.offset === 0) {
+                $class_list.html('');
+            }
+            $class_list.find('.more-models').remove();
 
-            _.each(models, function (model) {
+            _.each(result.models, function (model) {
                 var $html = $(qweb.render('bi_view_editor.ModelListItem', {
                     'id': model.id,
                     'model': model.model,
@@ -88,7 +163,7 @@ odoo.define('bi_view_editor.ModelList', function (require) {
                 $html.find('.class').data('model', model).click(function () {
                     self.modelClicked($(this));
                 });
-                self.$el.find(".class-list").append($html);
+                $class_list.append($html);
 
                 if (self.isActive(model.id)) {
                     self.loadFields(model.id).done(function (fields) {
@@ -96,18 +171,20 @@ odoo.define('bi_view_editor.ModelList', function (require) {
                     });
                 }
             });
+            if ($class_list.find('.class').length < result.length) {
+                $(qweb.render('bi_view_editor.ModelListMore', {
+                    'class_name': 'more-models'
+                })).click(function () {
+                    self.loadMoreModels();
+                }).appendTo($class_list);
+            }
         },
-        populateFields: function (fields, model_id) {
+        populateFields: function (result, model_id) {
             var self = this;
-            if (!model_id && fields.length === 0) {
-                return;
-            }
-            var data_model_id = model_id;
-            if (!data_model_id) {
-                data_model_id = fields[0].model_id;
-            }
-            var $model_item = this.$el.find(".class[data-id='" + data_model_id + "']");
-            _.each(fields, function (field) {
+            var $container = this.$el.find(
+                ".class[data-id='" + model_id + "']").parent();
+            $container.find('.more-fields').remove();
+            _.each(result.fields, function (field) {
                 var $field = $(qweb.render('bi_view_editor.ModelListFieldItem', {
                     name: field.name,
                     description: field.description
@@ -120,16 +197,22 @@ odoo.define('bi_view_editor.ModelList', function (require) {
                     'appendTo': 'body',
                     'containment': 'window'
                 });
-                $model_item.after($field);
-
+                $container.append($field);
             });
+            if ($container.find('.field').length < result.length) {
+                $(qweb.render('bi_view_editor.ModelListMore', {
+                    'class_name': 'more-fields'
+                })).click(function () {
+                    self.loadMoreFields(model_id);
+                }).appendTo($container);
+            }
         },
         modelClicked: function ($el) {
             if (this.mode === 'readonly') {
                 return;
             }
             var model = $el.data('model');
-            $el.parent().find('.field').remove();
+            $el.parent().find('.field, .more-fields').remove();
             if (this.isActive(model.id)) {
                 this.removeAsActive(model.id);
             } else {
@@ -150,19 +233,15 @@ odoo.define('bi_view_editor.ModelList', function (require) {
             this.filter($input.val());
         },
         filter: function (value) {
-            this.active_models = [];
-            this.$el.find('.field').remove();
             var val = typeof value === 'undefined' ? this.current_filter : value.toLowerCase();
-            this.$el.find(".class").each(function () {
-                var data = $(this).data('model');
-                if (data.name.toLowerCase().indexOf(val) === -1 &&
-                    data.model.toLowerCase().indexOf(val) === -1) {
-                    $(this).addClass('hidden');
-                } else {
-                    $(this).removeClass('hidden');
-                }
-            });
+            if (val === this.current_filter) {
+                return;
+            }
+            this.active_models = [];
             this.current_filter = val;
+            this.loadModels(this.model_ids).done(function (result) {
+                this.populateModels(result);
+            }.bind(this));
         }
     });
 
@@ -9,14 +9,25 @@ odoo.define('bi_view_editor', function (require) {
     var FieldList = require('bi_view_editor.FieldList').FieldList;
 
     var AbstractField = require('web.AbstractField');
+    var core = require('web.core');
     var Data = require('web.data');
     var field_registry = require('web.field_registry');
 
+    var QWeb = core.qweb;
+
+    // Delay before the cardinality of the view is estimated again, in ms
+    var ESTIMATE_DELAY = 500;
+
     var BiViewEditor = AbstractField.extend({
         template: "bi_view_editor.Frame",
         events: {
             "click .clear-btn": "clear"
         },
+        init: function () {
+            this._super.apply(this, arguments);
+            this.estimateCardinality = _.debounce(
+                this._estimateCardinality, ESTIMATE_DELAY);
+        },
         start: function () {
             var self = this;
             var res = this._super.apply(this, arguments);
@@ -67,6 +78,34 @@ odoo.define('bi_view_editor', function (require) {
         },
         renderValue: function () {
             this.field_list.set(JSON.parse(this.value));
+            this.estimateCardinality();
+        },
+        _estimateCardinality: function () {
+            if (this.isDestroyed()) {
+                return;
+            }
+            var $estimate = this.$('.footer > .left');
+            var field_data = this.field_list.get();
+            if (!field_data.length) {
+                $estimate.empty();
+                return;
+            }
+            var model = new Data.DataSet(this, "bve.view");
+            model.call('get_cardinality_estimate', [
+                JSON.stringify(field_data),
+                this.record.data.is_aggregated,
+                this.record.data.domain
+            ]).then(function (result) {
+                if (result.rows === false) {
+                    $estimate.empty();
+                    return;
+                }
+                $estimate.html(QWeb.render('bi_view_editor.CardinalityEstimate', {
+                    rows: Math.round(result.rows).toLocaleString(),
+                    cost: Math.round(result.cost).toLocaleString(),
+                    warning: result.warning,
+                }));
+            });
         },
         updateMode: function () {
             if (this.mode === 'readonly') {
@@ -116,6 +155,66 @@ odoo.define('bi_view_editor', function (require) {
             this.loadAndPopulateModelList();
             this._setValue(this.field_list.get());
         },
+        addFieldAndJoinPath: function (field, path) {
+            var used_aliases = [];
+            _.each(this.field_list.get(), function (item) {
+                used_aliases.push(item.table_alias);
+                if (item.join_node) {
+                    used_aliases.push(item.join_node);
+                }
+            });
+            var n = 0;
+            var current_alias = path.table_alias;
+            _.each(path.steps, function (step) {
+                while (used_aliases.indexOf("t" + n) !== -1) {
+                    n++;
+                }
+                var new_alias = "t" + n;
+                used_aliases.push(new_alias);
+                var join_node = _.omit(step, 'direction');
+                if (step.direction === 'out') {
+                    join_node.table_alias = current_alias;
+                    join_node.join_node = new_alias;
+                } else {
+                    join_node.table_alias = new_alias;
+                    join_node.join_node = current_alias;
+                }
+                this.field_list.add(join_node);
+                current_alias = new_alias;
+            }, this);
+
+            field.table_alias = current_alias;
+            this.field_list.add(field);
+            this.loadAndPopulateModelList();
+            this._setValue(this.field_list.get());
+        },
+        addFieldAsNewNode: function (field) {
+            field.table_alias = this.getTableAlias(field);
+            this.field_list.add(field);
+            this.loadAndPopulateModelList();
+            this._setValue(this.field_list.get());
+        },
+        openJoinDialog: function (field, choices) {
+            var dialog = new JoinNodeDialog(this, {}, choices, this.field_list.getModelData());
+            dialog.open().on('chosen', this, function (e) {
+                if (e.choice.steps) {
+                    this.addFieldAndJoinPath(field, e.choice);
+                } else {
+                    this.addFieldAndJoinNode(field, e.choice);
+                }
+            });
+        },
+        addFieldWithJoinPath: function (field) {
+            var model = new Data.DataSet(this, "ir.model");
+            var field_data = this.field_list.get();
+            model.call('get_join_paths', [field_data, field]).then(function (paths) {
+                if (paths.length > 0) {
+                    this.openJoinDialog(field, paths);
+                } else {
+                    this.addFieldAsNewNode(field);
+                }
+            }.bind(this));
+        },
         addField: function (field) {
             var data = _.extend({}, field);
             var model = new Data.DataSet(this, "ir.model");
@@ -124,19 +223,19 @@ odoo.define('bi_view_editor', function (require) {
                 if (result.length === 1) {
                     this.addFieldAndJoinNode(data, result[0]);
                 } else if (result.length > 1) {
-                    var dialog = new JoinNodeDialog(this, {}, result, this.field_list.getModelData());
-                    dialog.open().on('chosen', this, function (e) {
-                        this.addFieldAndJoinNode(data, e.choice);
-                    });
+                    this.openJoinDialog(data, result);
+                } else if (field_data.length > 0) {
+                    this.addFieldWithJoinPath(data);
                 } else {
-                    var table_alias = this.getTableAlias(data);
-                    data.table_alias = table_alias;
-                    this.field_list.add(data);
-                    this.loadAndPopulateModelList();
-                    this._setValue(this.field_list.get());
+                    this.addFieldAsNewNode(data);
                 }
             }.bind(this));
         },
+        _setValue: function () {
+            var res = this._super.apply(this, arguments);
+            this.estimateCardinality();
+            return res;
+        },
         _parseValue: function (value) {
             return JSON.stringify(value);
         }
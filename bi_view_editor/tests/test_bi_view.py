@@ -1,10 +1,15 @@
 # Copyright 2017-2018 Onestein (<http://www.onestein.eu>)
 # License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl).
 
+import contextlib
+import importlib.util
+import io
 import json
+import os
 
 from odoo.tests.common import TransactionCase, at_install, post_install
 from odoo.exceptions import UserError
+from odoo.tools import sql
 
 
 class TestBiViewEditor(TransactionCase):
@@ -116,6 +121,31 @@ class TestBiViewEditor(TransactionCase):
         self.assertIsInstance(fields, list)
         self.assertGreater(len(fields), 0)
 
+    def test_01_search_bi_fields(self):
+        Model = self.env['ir.model']
+        res = Model.search_bi_fields(self.partner_model.id, 'name', limit=2)
+        self.assertLessEqual(len(res['fields']), 2)
+        self.assertGreaterEqual(res['length'], len(res['fields']))
+        self.assertEqual(res['fields'][0]['name'], 'name')
+        page = Model.search_bi_fields(self.partner_model.id, limit=10)
+        next_page = Model.search_bi_fields(
+            self.partner_model.id, limit=10, offset=10)
+        self.assertEqual(page['length'], next_page['length'])
+        self.assertFalse(
+            set(f['id'] for f in page['fields']) &
+            set(f['id'] for f in next_page['fields']))
+
+    def test_01_search_bi_models(self):
+        Model = self.env['ir.model']
+        res = Model.search_bi_models('res.partner')
+        self.assertEqual(res['models'][0]['model'], 'res.partner')
+        res = Model.search_bi_models(limit=5)
+        self.assertEqual(len(res['models']), 5)
+        self.assertEqual(res['length'], len(Model.get_models()))
+        res = Model.search_bi_models(
+            'company', model_ids={'t0': self.partner_model.id})
+        self.assertIn('res.company', [m['model'] for m in res['models']])
+
     def test_02_get_join_nodes(self):
         Fields = self.env['ir.model.fields']
         field_res_users = Fields.search([
@@ -158,6 +188,59 @@ class TestBiViewEditor(TransactionCase):
         self.assertIsInstance(related_models, list)
         self.assertGreater(len(related_models), 0)
 
+    def test_04_relation_graph(self):
+        Model = self.env['ir.model']
+        graph = Model._get_relation_graph()
+        self.assertIn(
+            (self.partner_company_field.id, self.company_model_name),
+            graph['outgoing'][self.partner_model.id])
+        self.assertIn(
+            (self.partner_company_field.id, self.partner_model.id),
+            graph['incoming'][self.company_model_name])
+        join_nodes = Model._get_related_fields(
+            {'t0': self.partner_model.id},
+            related_model_id=self.company_model.id)
+        self.assertIn(
+            self.partner_company_field.id, [f['id'] for f in join_nodes])
+        self.assertTrue(all(
+            f['relation'] == self.company_model_name or
+            f['model_id'] == self.company_model.id for f in join_nodes))
+
+    def test_04_get_join_paths(self):
+        Model = self.env['ir.model']
+        Fields = self.env['ir.model.fields']
+        field_res_users = Fields.search([
+            ('name', '=', 'login'),
+            ('model', '=', 'res.users')
+        ], limit=1)
+        field_country = Fields.search([
+            ('name', '=', 'name'),
+            ('model', '=', 'res.country')
+        ], limit=1)
+        field_data = [{
+            'model_id': field_res_users.model_id.id,
+            'name': 'login',
+            'table_alias': 't0',
+            'id': field_res_users.id,
+            'model': 'res.users',
+        }]
+        new_field = {
+            'model_id': field_country.model_id.id,
+            'name': 'name',
+            'id': field_country.id,
+            'model': 'res.country',
+        }
+        paths = Model.get_join_paths(field_data, new_field, limit=3)
+        self.assertGreater(len(paths), 0)
+        self.assertLessEqual(len(paths), 3)
+        lengths = [path['length'] for path in paths]
+        self.assertEqual(lengths, sorted(lengths))
+        for path in paths:
+            self.assertEqual(path['table_alias'], 't0')
+            self.assertEqual(len(path['steps']), path['length'])
+            self.assertTrue(all(
+                step['direction'] in ('in', 'out') for step in path['steps']))
+
     def test_05_create_copy_view(self):
         vals = self.bi_view1_vals
         vals.update({'name': 'Test View1'})
@@ -183,6 +266,21 @@ class TestBiViewEditor(TransactionCase):
         bi_view2 = self.env['bve.view'].create(vals)
         self.assertEqual(len(bi_view2.user_ids), len(employees_group.users))
 
+        BveView = self.env['bve.view']
+        self.assertIn(bi_view2, BveView.search([
+            ('user_ids', 'in', employees_group.users[:1].ids)]))
+        bi_view2.group_ids = False
+        self.assertFalse(bi_view2.user_ids)
+        self.assertIn(bi_view2, BveView.search([
+            ('user_ids', 'in', employees_group.users[:1].ids)]))
+        bi_view2.group_ids = employees_group
+
+        portal_user = self.env.ref('base.demo_user0', False)
+        if portal_user and employees_group not in portal_user.groups_id:
+            self.assertNotIn(bi_view2, BveView.search([
+                ('user_ids', '=', portal_user.id)]))
+            self.assertNotIn(bi_view2, BveView.sudo(portal_user).search([]))
+
     def test_07_check_empty_data(self):
         vals = {
             'name': 'Test View Empty',
@@ -196,12 +294,233 @@ class TestBiViewEditor(TransactionCase):
         with self.assertRaises(UserError):
             bi_view4.action_create()
 
+    def test_07_build_sql_query(self):
+        vals = self.bi_view1_vals
+        vals.update({'name': 'Test View Joins'})
+        bi_view = self.env['bve.view'].create(vals)
+        query = bi_view._build_sql_query()
+        self.assertIn('FROM res_partner AS t0', query)
+        self.assertIn(
+            'INNER JOIN res_company AS t1 ON (t0.company_id = t1.id)', query)
+        self.assertNotIn('WHERE', query)
+
+        data = json.loads(bi_view.data)
+        data[1]['join_left'] = True
+        bi_view.data = json.dumps(data)
+        query = bi_view._build_sql_query()
+        self.assertIn(
+            'LEFT JOIN res_company AS t1 ON (t0.company_id = t1.id)', query)
+        self.env.cr.execute(query)
+        partner_count = self.env['res.partner'].with_context(
+            active_test=False).search_count([])
+        self.assertEqual(self.env.cr.rowcount, partner_count)
+
+    def test_07_build_sql_query_aggregated(self):
+        vals = self.bi_view1_vals
+        vals.update({'name': 'Test View Aggregated', 'is_aggregated': True})
+        bi_view = self.env['bve.view'].create(vals)
+        data = json.loads(bi_view.data)
+        data[0].update({'column': 0, 'measure': 1, 'aggregate': 'count'})
+        bi_view.data = json.dumps(data)
+        query = bi_view._build_sql_query()
+        self.assertIn('count(t0.name) AS x_name', query)
+        self.assertIn('count(*) AS x_bve_count', query)
+        self.assertIn('GROUP BY t1.name', query)
+        self.env.cr.execute(query)
+        self.assertEqual(
+            sum(row[1] for row in self.env.cr.fetchall()),
+            self.env['res.partner'].with_context(
+                active_test=False).search_count([('company_id', '!=', False)]))
+        self.assertEqual(
+            bi_view._get_group_operators(bi_view.model_name),
+            {'x_name': 'sum'})
+
+        data[0]['aggregate'] = 'median'
+        bi_view.data = json.dumps(data)
+        with self.assertRaises(UserError):
+            bi_view._build_sql_query()
+
+    def test_07_build_sql_query_filter(self):
+        vals = self.bi_view1_vals
+        vals.update({
+            'name': 'Test View Filter',
+            'domain': "[('is_company', '=', True), ('name', 'ilike', \"'\")]",
+        })
+        bi_view = self.env['bve.view'].create(vals)
+        self.assertEqual(bi_view.root_model, self.partner_model_name)
+        query = bi_view._build_sql_query()
+        self.assertIn('WHERE t0.id IN (SELECT "res_partner".id', query)
+        self.env.cr.execute(query)
+        Partner = self.env['res.partner'].with_context(active_test=False)
+        self.assertEqual(self.env.cr.rowcount, Partner.search_count([
+            ('is_company', '=', True),
+            ('name', 'ilike', "'"),
+            ('company_id', '!=', False)]))
+
+        bi_view.domain = "[('no_such_field', '=', 1)]"
+        with self.assertRaises(UserError):
+            bi_view._build_sql_query()
+
+    def test_07_build_sql_query_derived(self):
+        date_field = self.env['ir.model.fields'].search([
+            ('model', '=', self.partner_model_name),
+            ('name', '=', 'create_date')], limit=1)
+        color_field = self.env['ir.model.fields'].search([
+            ('model', '=', self.partner_model_name),
+            ('name', '=', 'color')], limit=1)
+        data = json.loads(self.bi_view1_vals['data'])
+        date_data = dict(
+            data[0], id=date_field.id, type=date_field.ttype,
+            name='create_date_month', derived='month')
+        color_data = dict(
+            data[0], id=color_field.id, type=color_field.ttype, name='color')
+        ratio_data = dict(
+            color_data, name='color_divide', derived='divide',
+            operand='color')
+        data += [date_data, color_data, ratio_data]
+        vals = self.bi_view1_vals
+        vals.update({'name': 'Test View Derived', 'data': json.dumps(data)})
+        bi_view = self.env['bve.view'].create(vals)
+        query = bi_view._build_sql_query()
+        self.assertIn(
+            "to_char(t0.create_date, 'YYYY-MM') AS x_create_date_month",
+            query)
+        self.assertIn(
+            "(t0.color::float8 / NULLIF(t0.color, 0)) AS x_color_divide",
+            query)
+        self.env.cr.execute(query)
+
+        ratio_data['operand'] = 'no_such_field'
+        bi_view.data = json.dumps(data)
+        with self.assertRaises(UserError):
+            bi_view._build_sql_query()
+        ratio_data['operand'] = None
+        bi_view.data = json.dumps(data)
+        with self.assertRaises(UserError):
+            bi_view._build_sql_query()
+
+    def test_07_prune_sql_joins(self):
+        company_partner_field = self.env['ir.model.fields'].search([
+            ('model', '=', self.company_model_name),
+            ('name', '=', 'partner_id')], limit=1)
+        data = json.loads(self.bi_view1_vals['data'])[:2]
+        data.append({
+            'model_id': self.company_model.id,
+            'name': 'partner_id',
+            'table_alias': 't1',
+            'custom': 0,
+            'relation': self.partner_model_name,
+            'model': self.company_model_name,
+            'model_name': self.company_model.name,
+            'type': company_partner_field.ttype,
+            'id': company_partner_field.id,
+            'join_node': 't2',
+            'description': company_partner_field.field_description,
+            'row': 0,
+            'column': 0,
+            'list': 1,
+            'measure': 0
+        })
+        vals = self.bi_view1_vals
+        vals.update({'name': 'Test View Pruning', 'data': json.dumps(data)})
+        bi_view = self.env['bve.view'].create(vals)
+        # res_company.partner_id is NOT NULL: t2 is pruned, but not t1
+        # which is joined on the nullable res_partner.company_id
+        query = bi_view._build_sql_query()
+        self.assertIn('INNER JOIN res_company AS t1', query)
+        self.assertNotIn('t2', query)
+
+        # without its foreign key, the column may refer to missing rows
+        self.env.cr.execute('SAVEPOINT test_prune_foreign_key')
+        self.env.cr.execute("""
+            SELECT k.conname
+              FROM pg_constraint k
+              JOIN pg_attribute a ON a.attrelid = k.conrelid
+               AND k.conkey = ARRAY[a.attnum]
+             WHERE k.conrelid = 'res_company'::regclass
+               AND k.contype = 'f' AND a.attname = 'partner_id'""")
+        for constraint, in self.env.cr.fetchall():
+            # pylint: disable=sql-injection
+            self.env.cr.execute(
+                'ALTER TABLE res_company DROP CONSTRAINT "%s"' % constraint)
+        query = bi_view._build_sql_query()
+        self.assertIn('INNER JOIN res_partner AS t2', query)
+        self.env.cr.execute('ROLLBACK TO SAVEPOINT test_prune_foreign_key')
+
+        data[1]['join_left'] = True
+        bi_view.data = json.dumps(data)
+        query = bi_view._build_sql_query()
+        self.assertNotIn('t1', query)
+        self.assertNotIn('JOIN', query)
+
+    def test_07_analyze_indexes(self):
+        vals = self.bi_view1_vals
+        vals.update({
+            'name': 'Test View Indexes',
+            'domain': "[('is_company', '=', True)]",
+        })
+        bi_view = self.env['bve.view'].create(vals)
+        self.assertEqual(bi_view._get_sql_index_candidates(), {
+            ('res_partner', 'company_id'): 'join',
+            ('res_partner', 'is_company'): 'filter',
+        })
+        bi_view.domain = "['|', (0, '=', 1), ('is_company', '=', True)]"
+        self.assertEqual(bi_view._get_sql_index_candidates(), {
+            ('res_partner', 'company_id'): 'join',
+            ('res_partner', 'is_company'): 'filter',
+        })
+        self.env.cr.execute(
+            "DROP INDEX IF EXISTS res_partner_is_company_index")
+        bi_view.action_analyze_indexes()
+        suggestion = bi_view.index_ids.filtered(
+            lambda x: x.column_name == 'is_company')
+        self.assertEqual(len(suggestion), 1)
+        self.assertEqual(suggestion.reason, 'filter')
+        self.assertGreaterEqual(suggestion.estimated_size, 0)
+
+        suggestion.action_create_index()
+        self.assertEqual(suggestion.state, 'created')
+        bi_view.action_analyze_indexes()
+        self.assertNotIn(
+            'is_company', bi_view.index_ids.mapped('column_name'))
+
     def test_08_get_models(self):
         Model = self.env['ir.model']
         models = Model.get_models()
         self.assertIsInstance(models, list)
         self.assertGreater(len(models), 0)
 
+    def test_08_get_readable_models(self):
+        Model = self.env['ir.model']
+        Access = self.env['ir.model.access']
+        user = self.env.ref('base.user_demo')
+        readable_models = Model.sudo(user)._get_readable_models()
+        for model in [self.partner_model_name, 'res.groups', 'ir.rule']:
+            self.assertEqual(
+                model in readable_models,
+                Access.sudo(user).check(model, 'read', False))
+
+    def test_08_get_readable_models_global_access(self):
+        Model = self.env['ir.model']
+        Access = self.env['ir.model.access']
+        user = self.env.ref('base.user_demo')
+        model = Model.search([('model', '=', 'res.partner.industry')])
+        Access.search([('model_id', '=', model.id)]).unlink()
+        # a group rule denying the read does not hide the global rule
+        Access.create({
+            'name': 'test group access',
+            'model_id': model.id,
+            'group_id': self.env.ref('base.group_user').id,
+            'perm_read': False,
+        })
+        Access.create({
+            'name': 'test global access',
+            'model_id': model.id,
+            'perm_read': True,
+        })
+        self.assertTrue(Access.sudo(user).check(model.model, 'read', False))
+        self.assertIn(model.model, Model.sudo(user)._get_readable_models())
+
     @at_install(False)
     @post_install(True)
     def test_09_create_open_bve_object(self):
@@ -221,6 +540,12 @@ class TestBiViewEditor(TransactionCase):
             ('name', '=', 'Test View4')
         ])
         self.assertEqual(len(model), 1)
+        read_write_access = model.access_ids.filtered('perm_write')
+        self.assertEqual(read_write_access.mapped('group_id'), employees_group)
+        # groups with read access to both res.partner and res.company
+        self.assertIn(
+            self.env.ref('base.group_user'),
+            model.access_ids.mapped('group_id'))
 
         # open view
         open_action = bi_view.open_view()
@@ -249,3 +574,218 @@ class TestBiViewEditor(TransactionCase):
         self.assertEqual(len(bi_view), 1)
         # create bve object
         bi_view.action_create()
+
+    @at_install(False)
+    @post_install(True)
+    def test_11_create_materialized_bve_object(self):
+        vals = self.bi_view1_vals
+        employees_group = self.env.ref('base.group_user')
+        data = json.loads(vals['data'])
+        data[0]['index'] = True
+        vals.update({
+            'name': 'Test View6',
+            'is_materialized': True,
+            'data': json.dumps(data),
+            'group_ids': [(6, 0, [employees_group.id])],
+        })
+        bi_view = self.env['bve.view'].create(vals)
+        bi_view.action_create()
+        table_name = 'x_bve_testview6'
+        self.assertEqual(sql.table_kind(self.env.cr, table_name), 'm')
+        self.env.cr.execute(
+            "SELECT indexname FROM pg_indexes WHERE tablename = %s",
+            (table_name,))
+        self.assertEqual(
+            set(row[0] for row in self.env.cr.fetchall()),
+            {'x_bve_testview6_id_index', 'x_bve_testview6_x_name_index'})
+        self.assertTrue(bi_view.cron_id)
+        self.assertTrue(bi_view.last_refresh)
+
+        bi_view.last_refresh = False
+        bi_view._refresh_materialized_view_cron(bi_view.ids)
+        self.assertTrue(bi_view.last_refresh)
+
+        cron = bi_view.cron_id
+        bi_view.action_reset()
+        self.assertFalse(cron.exists())
+        self.assertFalse(sql.table_kind(self.env.cr, table_name))
+
+    @at_install(False)
+    @post_install(True)
+    def test_12_create_bve_objects_batch(self):
+        employees_group = self.env.ref('base.group_user')
+        bi_views = self.env['bve.view']
+        for name in ['Test View7', 'Test View8']:
+            vals = dict(self.bi_view1_vals)
+            vals.update({
+                'name': name,
+                'group_ids': [(6, 0, [employees_group.id])],
+            })
+            bi_views |= self.env['bve.view'].create(vals)
+        bi_views.action_create()
+        self.assertEqual(set(bi_views.mapped('state')), {'created'})
+        for bi_view in bi_views:
+            self.assertIn(bi_view.model_name, self.env)
+            self.assertTrue(bi_view.action_id)
+        bi_views._reset()
+        self.assertEqual(set(bi_views.mapped('state')), {'draft'})
+        self.assertFalse(self.env['ir.model'].search([
+            ('model', 'in', bi_views.mapped('model_name'))]))
+
+    @at_install(False)
+    @post_install(True)
+    def test_13_read_group_cache(self):
+        vals = dict(self.bi_view1_vals)
+        vals.update({
+            'name': 'Test View9',
+            'cache_ttl': 60,
+        })
+        bi_view = self.env['bve.view'].create(vals)
+        bi_view.action_create()
+        model = self.env[bi_view.model_name]
+        fields = list(model._fields)
+        groupby = [name for name in fields if name.startswith('x_')][:1]
+
+        result = model.read_group([], groupby, groupby)
+        query_count = self.env.cr.sql_log_count
+        self.assertEqual(model.read_group([], groupby, groupby), result)
+        self.assertEqual(self.env.cr.sql_log_count, query_count)
+
+        # a different domain is not served from the cache
+        self.assertEqual(
+            model.read_group([('id', '=', 0)], groupby, groupby), [])
+
+        # the new duration is applied at once, without clearing the other
+        # caches of the registry
+        bi_view.cache_ttl = 0
+        query_count = self.env.cr.sql_log_count
+        self.assertEqual(model.read_group([], groupby, groupby), result)
+        self.assertGreater(self.env.cr.sql_log_count, query_count)
+        bi_view._reset()
+
+    @at_install(False)
+    @post_install(True)
+    def test_14_query_stats(self):
+        vals = dict(self.bi_view1_vals)
+        vals.update({'name': 'Test View10'})
+        bi_view = self.env['bve.view'].create(vals)
+        bi_view.action_create()
+        self.env[bi_view.model_name].search([])
+
+        Stat = self.env['bve.view.stat']
+        stats = Stat._read_query_stats(['x_bve_testview10'])
+        self.assertEqual(bi_view.stat_available, stats is not None)
+        snapshots = Stat._cron_snapshot()
+        if stats is None:
+            self.assertFalse(snapshots)
+            self.assertFalse(bi_view.stat_calls)
+        else:
+            self.assertIn(bi_view, snapshots.mapped('bve_view_id'))
+            self.assertTrue(bi_view.stat_ids)
+        action = bi_view.action_stats_history()
+        self.assertEqual(action['domain'], [('bve_view_id', '=', bi_view.id)])
+        bi_view._reset()
+
+    def test_15_get_group_operators_once(self):
+        vals = dict(self.bi_view1_vals)
+        vals.update({'name': 'Test View11', 'is_aggregated': True})
+        bi_view = self.env['bve.view'].create(vals)
+        data = json.loads(bi_view.data)
+        data[0].update({'column': 0, 'measure': 1, 'aggregate': 'max'})
+        bi_view.data = json.dumps(data)
+        self.assertEqual(
+            bi_view._get_group_operators(bi_view.model_name),
+            {'x_name': 'max'})
+        # the operators of the other views are read by the same query
+        query_count = self.env.cr.sql_log_count
+        self.assertEqual(bi_view._get_group_operators('x_bve.other'), {})
+        self.assertEqual(self.env.cr.sql_log_count, query_count)
+
+        # the averages are not averaged again
+        data[0]['aggregate'] = 'avg'
+        bi_view.data = json.dumps(data)
+        self.assertEqual(
+            bi_view._get_group_operators(bi_view.model_name),
+            {'x_name': False})
+
+    def test_16_export_sql_view(self):
+        vals = dict(self.bi_view1_vals)
+        vals.update({'name': 'Test View12'})
+        bi_view = self.env['bve.view'].create(vals)
+        if 'bi.sql.view' not in self.env:
+            with self.assertRaises(UserError):
+                bi_view.action_export_sql_view()
+            return
+        action = bi_view.action_export_sql_view()
+        sql_view = self.env['bi.sql.view'].browse(action['res_id'])
+        self.assertTrue(sql_view.is_materialized)
+        self.assertEqual(sql_view.technical_name, 'bve_testview12')
+        self.assertEqual(sql_view.state, 'sql_valid')
+        sql_fields = {
+            f.name: f for f in sql_view.bi_sql_view_field_ids}
+        self.assertNotIn('id', sql_fields)
+        # the foreign key of the join is not a field of the BI view
+        self.assertNotIn('x_company_id', sql_fields)
+        self.assertEqual(set(sql_fields), {'x_name', 'x_name_1'})
+        self.assertEqual(sql_fields['x_name'].ttype, 'char')
+        with self.assertRaises(UserError):
+            bi_view.action_export_sql_view()
+
+    @at_install(False)
+    @post_install(True)
+    def test_17_benchmark(self):
+        path = os.path.join(
+            os.path.dirname(__file__), os.pardir, 'scripts', 'benchmark.py')
+        spec = importlib.util.spec_from_file_location('benchmark', path)
+        benchmark = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(benchmark)
+        with contextlib.redirect_stdout(io.StringIO()) as out:
+            results = benchmark.benchmark(self.env, 3, 2, 2)
+        self.assertEqual(
+            [r['step'] for r in results],
+            ['get_models', 'get_fields', 'get_related_models',
+             'get_join_nodes', 'action_create', 'action_reset'])
+        self.assertEqual(len(out.getvalue().splitlines()), len(results))
+        for result in results:
+            self.assertLessEqual(result['p50'], result['p95'])
+            self.assertGreater(result['queries_p95'], 0)
+        self.assertFalse(self.env['ir.model'].search([
+            ('model', '=like', 'x_bench_bve_%')]))
+        self.assertNotIn('x_bench_bve_0', self.env.registry)
+
+    def test_18_get_cardinality_estimate(self):
+        BveView = self.env['bve.view']
+        res = BveView.get_cardinality_estimate(self.bi_view1_vals['data'])
+        self.assertGreater(res['rows'], 0)
+        self.assertGreater(res['cost'], 0)
+        self.assertFalse(res['warning'])
+
+        self.env['ir.config_parameter'].set_param(
+            'bi_view_editor.cardinality_warning_threshold', '0')
+        res = BveView.get_cardinality_estimate(self.bi_view1_vals['data'])
+        self.assertTrue(res['warning'])
+
+        # incomplete or invalid queries have no estimate
+        res = BveView.get_cardinality_estimate('[]')
+        self.assertFalse(res['rows'])
+        res = BveView.get_cardinality_estimate(
+            self.bi_view1_vals['data'], domain="[('name', '=',")
+        self.assertFalse(res['rows'])
+
+        # the aliases and names written in the query are checked first
+        data = json.loads(self.bi_view1_vals['data'])
+        data[0]['table_alias'] = 't0; DROP TABLE res_partner; --'
+        res = BveView.get_cardinality_estimate(json.dumps(data))
+        self.assertFalse(res['rows'])
+        data = json.loads(self.bi_view1_vals['data'])
+        data[0]['name'] = 'name FROM res_users --'
+        res = BveView.get_cardinality_estimate(json.dumps(data))
+        self.assertFalse(res['rows'])
+        with self.assertRaises(UserError):
+            BveView.new({'data': json.dumps(data)})._build_sql_query()
+
+        # an invalid threshold falls back to the default one
+        self.env['ir.config_parameter'].set_param(
+            'bi_view_editor.cardinality_warning_threshold', 'many')
+        res = BveView.get_cardinality_estimate(self.bi_view1_vals['data'])
+        self.assertFalse(res['warning'])